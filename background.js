@@ -0,0 +1,298 @@
+// 后台脚本，每天下载一次必应每日图片并保存到IndexedDB，新标签页打开时只读取本地的图片，不发起网络请求
+importScripts("idb.js"); // 引入数据库脚本文件
+const wallpaperAlarm = "wallpaper"; // 下载每日图片的定时器名称
+const wallpaperPeriod = 24 * 60; // 下载每日图片的间隔，单位为分钟
+const defaultWallpaperEndpoint = "https://www.bing.com/HPImageArchive.aspx?format=js&idx=0&n=1&mkt=zh-CN"; // 必应每日图片的接口，返回最近一张图片的信息，可以在本地存储的wallpaperEndpoint中改为本地的测试服务器
+const placeholderWidth = 32; // 占位图的宽度，高度按图片的比例计算，保存为几百字节的JPEG
+const variantWidths = [1280, 1920, 2560, 3840]; // 缩小版本的宽度，只生成比原图小的版本，新标签页按窗口大小选择
+const variantQuality = 0.85; // 缩小版本的JPEG质量
+const wallpaperHistory = 30; // 最多保存的每日图片数量，超过时清理最久没有显示的图片
+const wallpaperQuotaRatio = 0.8; // 扩展的存储用量不超过配额的比例，超过时清理最久没有显示的图片
+const wallpaperChunkSize = 256 * 1024; // 下载图片时每收到这么多字节写入一次数据库并记录进度
+let wallpaperTask = null; // 正在进行的下载，同时只下载一次
+
+// 确保下载每日图片的定时器存在，第一次创建时立即下载一次
+function scheduleWallpaper() {
+  chrome.alarms.get(wallpaperAlarm, alarm => { // 获取定时器
+    if (!alarm) chrome.alarms.create(wallpaperAlarm, {when: Date.now(), periodInMinutes: wallpaperPeriod}); // 立即下载一次，之后每天下载
+  });
+}
+
+// 下载最新的每日图片，正在下载时返回同一个Promise
+function updateWallpaper() {
+  if (!wallpaperTask) { // 如果没有正在进行的下载
+    wallpaperTask = fetchWallpaper().catch(() => {}).then(() => { // 下载失败时等下一次定时器
+      wallpaperTask = null; // 下载结束
+    });
+  }
+  return wallpaperTask;
+}
+
+// 从接口获取最近一张图片的信息，接口和图片都带上保存的验证信息发起条件请求，没有变化时不下载图片，也不重新生成缩小版本
+function fetchWallpaper() {
+  let endpoint = ""; // 图片接口
+  return new Promise(resolve => chrome.storage.local.get(["wallpaperEndpoint", "wallpaperInfo"], resolve)).then(data => { // 从本地存储中获取设置的接口和接口的验证信息
+    endpoint = data.wallpaperEndpoint || defaultWallpaperEndpoint; // 没有设置时使用必应的接口
+    let saved = data.wallpaperInfo && data.wallpaperInfo.endpoint === endpoint ? data.wallpaperInfo : {}; // 换了接口后之前的验证信息无效
+    return fetch(endpoint, {credentials: "omit", cache: "no-store", headers: getConditionalHeaders(saved)}); // 获取图片信息，不携带Cookie，不使用浏览器缓存，由服务器判断是否变化
+  }).then(response => {
+    if (response.status === 304) return; // 接口返回的内容没有变化，图片也不用检查
+    if (!response.ok) throw new Error("wallpaper info " + response.status); // 接口出错
+    let info = Object.assign({endpoint: endpoint}, getValidators(response)); // 接口的验证信息
+    return response.json().then(data => syncWallpaper(data.images[0], endpoint)).then(() => { // 读取JSON并更新最近一张图片
+      chrome.storage.local.set({wallpaperInfo: info}); // 图片处理完成后才保存接口的验证信息，处理失败时下次重新获取
+    });
+  });
+}
+
+// 按接口返回的图片信息更新保存的图片，保存过同一个链接的图片时发起条件请求，返回304或者内容的哈希值相同时只更新图片信息，图片变化时重新生成缩小版本并通知新标签页
+function syncWallpaper(image, endpoint) {
+  let url = new URL(image.url, endpoint).href; // 图片的链接是相对于接口的
+  let fields = {url: url, title: image.title || "", copyright: image.copyright || ""}; // 接口返回的图片信息
+  return getWallpaper(image.startdate).then(saved => { // 按日期查找已经保存的图片
+    return downloadImage(url, saved && saved.url === url ? saved : {}).then(download => { // 下载图片，同一个链接的图片才能重新验证
+      if (!download) return refreshWallpaper(saved, fields); // 图片没有变化，不下载
+      Object.assign(fields, {etag: download.etag, lastModified: download.lastModified}); // 记录图片的验证信息
+      return hashBuffer(download.buffer).then(hash => { // 计算哈希值
+        if (saved && saved.hash === hash) return refreshWallpaper(saved, fields); // 内容和保存的图片相同，不重新生成缩小版本
+        let blob = new Blob([download.buffer], {type: download.type}); // 转换为Blob
+        return createVariants(blob).then(variants => { // 生成占位图和缩小版本
+          let record = Object.assign({date: image.startdate, blob: blob, hash: hash, fetchedAt: Date.now()}, fields, variants); // 图片记录
+          return trimWallpapers(record.date, getWallpaperSize(record)).then(() => saveWallpaper(record)); // 先留出空间再保存图片
+        }).then(() => {
+          chrome.storage.local.set({wallpaper: {date: image.startdate, fetchedAt: Date.now()}, wallpaperPick: ""}); // 记录最新图片的日期和下载时间，同一天的图片变化时也能触发变化，新标签页通过本地存储的变化得知，有了新的图片后不再显示用户选择的历史图片
+        });
+      });
+    });
+  });
+}
+
+// 下载图片，有同一个链接的中断的下载时用Range请求从中断的位置继续，否则按validators发起条件请求，返回304时结果为null，否则为完整的图片{buffer, type, etag, lastModified}
+// 进度已经完整时直接合并数据块，不发起请求，服务器返回416或其他4xx时进度无法继续使用，清除后重新下载完整的图片
+function downloadImage(url, validators) {
+  return new Promise(resolve => chrome.storage.local.get("wallpaperDownload", resolve)).then(data => { // 读取中断的下载的进度
+    let progress = data.wallpaperDownload; // 下载进度
+    if (progress && progress.url === url && progress.size && progress.received === progress.size) return assembleDownload(progress); // 上次在合并数据块前中断，数据已经完整
+    let resumable = progress && progress.url === url && progress.received > 0 && !progress.encoded && !!getIfRange(progress); // 同一个链接并且有强验证信息时才能继续，压缩传输时收到的字节数和Range的位置对不上
+    let headers = resumable ? {"Range": "bytes=" + progress.received + "-", "If-Range": getIfRange(progress)} : getConditionalHeaders(validators); // 图片在中断期间变化时服务器返回完整的图片
+    return fetch(url, {credentials: "omit", cache: "no-store", headers: headers}).then(response => { // 下载图片，不使用浏览器缓存
+      if (response.status === 304) return null; // 图片没有变化
+      if (response.status === 206) { // 服务器从中断的位置继续发送
+        let range = /^bytes (\d+)-\d+\/(\d+|\*)$/.exec(response.headers.get("Content-Range") || ""); // 解析返回的范围
+        if (!resumable || !range || Number(range[1]) !== progress.received) return clearDownload().then(() => { // 范围和已经收到的数据不连续
+          throw new Error("wallpaper range " + response.headers.get("Content-Range")); // 清除进度，下次重新下载
+        });
+        if (range[2] !== "*") progress.size = Number(range[2]); // 图片的总大小
+        return receiveImage(response, progress); // 继续接收数据
+      }
+      if (response.status >= 400 && response.status < 500) return clearDownload().then(() => { // 请求的范围无效或图片已经不存在，保留进度只会每次都失败
+        if (resumable) return downloadImage(url, validators); // 清除进度后立即重新下载，这次不带Range
+        throw new Error("wallpaper " + response.status); // 下载失败
+      });
+      if (!response.ok) throw new Error("wallpaper " + response.status); // 服务器出错，保留进度，下次继续
+      let type = (response.headers.get("Content-Type") || "").split(";")[0].trim(); // 图片的类型
+      if (!type.startsWith("image/")) throw new Error("wallpaper type " + type); // 不是图片，不保存
+      let encoding = (response.headers.get("Content-Encoding") || "identity").trim().toLowerCase(); // 传输时的压缩方式
+      let encoded = encoding !== "identity"; // 压缩传输时Content-Length是压缩后的长度，收到的是解压后的数据
+      let size = encoded ? 0 : Number(response.headers.get("Content-Length")) || 0; // 图片的总大小，不知道时为0
+      return clearDownload().then(() => receiveImage(response, Object.assign({url: url, type: type, size: size, received: 0, chunks: 0, encoded: encoded}, getValidators(response)))); // 从头开始下载，记录图片的验证信息，继续下载时用于If-Range
+    });
+  });
+}
+
+// 以流的方式接收图片，每收到wallpaperChunkSize字节写入一个数据块并保存进度，写入本地存储也会让浏览器延长后台脚本的生命周期，接收完整后合并数据块并清除进度，数据块不会作为背景显示
+function receiveImage(response, progress) {
+  let reader = response.body.getReader(); // 读取响应体的流
+  let pending = []; // 还没有写入的数据
+  let pendingSize = 0; // 还没有写入的数据的大小
+  let flush = () => { // 将还没有写入的数据写入一个数据块
+    if (!pendingSize) return Promise.resolve(); // 没有数据
+    let chunk = {index: progress.chunks, blob: new Blob(pending)}; // 数据块
+    let size = pendingSize; // 数据块的大小
+    pending = []; // 清空还没有写入的数据
+    pendingSize = 0;
+    return openDatabase().then(db => { // 打开数据库
+      let transaction = db.transaction("wallpaperChunks", "readwrite"); // 创建读写事务
+      transaction.objectStore("wallpaperChunks").put(chunk); // 保存数据块
+      return transactionPromise(transaction); // 等待事务提交
+    }).then(() => {
+      progress.chunks++; // 数据块的数量
+      progress.received += size; // 已经收到的字节数
+      return new Promise(resolve => chrome.storage.local.set({wallpaperDownload: progress}, resolve)); // 数据块写入后才保存进度，进度和数据块始终一致
+    });
+  };
+  let read = () => reader.read().then(result => { // 读取下一段数据
+    if (result.done) return flush(); // 接收完成，写入剩余的数据
+    pending.push(result.value); // 暂存数据
+    pendingSize += result.value.byteLength;
+    return (pendingSize >= wallpaperChunkSize ? flush() : Promise.resolve()).then(read); // 数据足够多时写入一个数据块
+  });
+  return read().then(() => { // 接收完成后
+    if (progress.size && progress.received !== progress.size) throw new Error("wallpaper incomplete " + progress.received + "/" + progress.size); // 连接提前结束，保留进度，下次继续
+    return assembleDownload(progress); // 合并数据块
+  });
+}
+
+// 按进度合并数据块为完整的图片，然后清除数据块和进度
+function assembleDownload(progress) {
+  return openDatabase().then(db => requestPromise(db.transaction("wallpaperChunks").objectStore("wallpaperChunks").getAll(IDBKeyRange.upperBound(progress.chunks, true)))).then(chunks => { // 按序号读取进度中记录的数据块，不读取中断时写入了但没有记录进度的数据块
+    return new Blob(chunks.map(chunk => chunk.blob)).arrayBuffer(); // 合并为完整的图片
+  }).then(buffer => {
+    return clearDownload().then(() => ({buffer: buffer, type: progress.type, etag: progress.etag, lastModified: progress.lastModified})); // 清除数据块和进度
+  });
+}
+
+// 清除中断的下载的数据块和进度
+function clearDownload() {
+  return openDatabase().then(db => { // 打开数据库
+    let transaction = db.transaction("wallpaperChunks", "readwrite"); // 创建读写事务
+    transaction.objectStore("wallpaperChunks").clear(); // 删除所有数据块
+    return transactionPromise(transaction); // 等待事务提交
+  }).then(() => new Promise(resolve => chrome.storage.local.remove("wallpaperDownload", resolve))); // 删除进度
+}
+
+// 有中断的下载时立即继续，不等下一次定时器
+function resumeWallpaper() {
+  chrome.storage.local.get("wallpaperDownload", data => { // 读取下载进度
+    if (data.wallpaperDownload) updateWallpaper(); // 继续下载
+  });
+}
+
+// 图片的内容没有变化时更新保存的图片信息，旧版本保存的图片补充生成缩小版本，都不需要时不写入数据库
+function refreshWallpaper(saved, fields) {
+  let changed = Object.keys(fields).some(key => saved[key] !== fields[key]); // 图片信息是否变化
+  if (saved.variants && !changed) return; // 没有变化
+  let variants = saved.variants ? Promise.resolve({}) : createVariants(saved.blob); // 旧版本保存的图片没有缩小版本
+  return variants.then(variants => saveWallpaper(Object.assign(saved, fields, variants))); // 保存更新后的图片记录
+}
+
+// 从响应中读取验证信息，没有时为空字符串
+function getValidators(response) {
+  return {etag: response.headers.get("ETag") || "", lastModified: response.headers.get("Last-Modified") || ""}; // ETag和Last-Modified
+}
+
+// 按保存的验证信息生成条件请求的请求头，没有验证信息时为空对象，发起普通请求
+function getConditionalHeaders(validators) {
+  let headers = {}; // 请求头
+  if (validators.etag) headers["If-None-Match"] = validators.etag; // 内容的标识相同时返回304
+  if (validators.lastModified) headers["If-Modified-Since"] = validators.lastModified; // 之后没有修改时返回304
+  return headers;
+}
+
+// 继续下载时If-Range使用的验证信息，服务器不会匹配弱ETag，这时改用Last-Modified，都没有时为空
+function getIfRange(progress) {
+  return progress.etag && !progress.etag.startsWith("W/") ? progress.etag : progress.lastModified || "";
+}
+
+// 计算数据的SHA-256哈希值，返回十六进制字符串
+function hashBuffer(buffer) {
+  return crypto.subtle.digest("SHA-256", buffer).then(digest => Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, "0")).join("")); // 计算哈希值并转换为十六进制
+}
+
+// 只解码一次原图，生成占位图和各个宽度的缩小版本，返回要合并到图片记录中的字段，variants按宽度从小到大排列，不包含原图
+function createVariants(blob) {
+  return createImageBitmap(blob).then(bitmap => { // 解码原图，后台脚本运行在工作线程中，不影响新标签页
+    let width = bitmap.width; // 原图的宽度
+    let height = bitmap.height; // 原图的高度
+    let widths = variantWidths.filter(item => item < width); // 只生成比原图小的版本
+    let placeholder = resizeImage(bitmap, placeholderWidth, Math.max(1, Math.round(height * placeholderWidth / width)), 0.7).then(readDataUrl).catch(() => ""); // 生成占位图，失败时不使用占位图
+    let variants = widths.map(item => { // 生成缩小版本
+      let variantHeight = Math.round(height * item / width); // 按原图的比例计算高度
+      return resizeImage(bitmap, item, variantHeight, variantQuality).then(variant => ({width: item, height: variantHeight, blob: variant})); // 记录版本的尺寸
+    });
+    return Promise.all([placeholder, ...variants]).then(results => { // 全部生成后
+      bitmap.close(); // 释放解码后的原图
+      return {width: width, height: height, placeholder: results[0], variants: results.slice(1)}; // 返回原图的尺寸、占位图和缩小版本
+    }, error => {
+      bitmap.close(); // 释放解码后的原图
+      throw error; // 生成失败时不保存
+    });
+  });
+}
+
+// 将解码后的图片缩小到指定的尺寸并编码为JPEG，缩放由createImageBitmap完成，比直接在画布上缩小的质量高
+function resizeImage(bitmap, width, height, quality) {
+  return createImageBitmap(bitmap, {resizeWidth: width, resizeHeight: height, resizeQuality: "high"}).then(resized => { // 缩小图片
+    let canvas = new OffscreenCanvas(width, height); // 创建离屏画布
+    canvas.getContext("2d").drawImage(resized, 0, 0); // 画出缩小后的图片
+    resized.close(); // 释放缩小后的图片
+    return canvas.convertToBlob({type: "image/jpeg", quality: quality}); // 编码为JPEG
+  });
+}
+
+// 将占位图转换为data URL，新标签页在原图解码完成前先显示占位图，data URL可以同步保存在快照中
+function readDataUrl(blob) {
+  return blob.arrayBuffer().then(buffer => "data:" + blob.type + ";base64," + btoa(String.fromCharCode(...new Uint8Array(buffer)))); // 读取数据并转换为base64
+}
+
+// 图片记录占用的空间，单位为字节
+function getWallpaperSize(record) {
+  return record.blob.size + (record.variants || []).reduce((size, variant) => size + variant.blob.size, 0) + (record.placeholder || "").length; // 原图、缩小版本和占位图的大小
+}
+
+// 清理最久没有显示的图片，为保存新图片留出空间，date和incoming为新图片的日期和大小，数量不超过wallpaperHistory，用量按navigator.storage.estimate()估算，不超过配额的wallpaperQuotaRatio，最新的图片和要替换的图片不清理
+function trimWallpapers(date, incoming) {
+  return openDatabase().then(db => { // 打开数据库
+    let transaction = db.transaction(["wallpapers", "wallpaperUses"]); // 创建只读事务
+    let records = requestPromise(transaction.objectStore("wallpapers").getAll()); // 读取所有图片，按日期从旧到新排列
+    let uses = requestPromise(transaction.objectStore("wallpaperUses").getAll()); // 读取所有图片最近一次显示的时间
+    let estimate = navigator.storage && navigator.storage.estimate ? navigator.storage.estimate() : Promise.resolve({usage: 0, quota: Infinity}); // 估算存储用量，不支持时只按数量清理
+    return Promise.all([records, uses, estimate]).then(([records, uses, estimate]) => {
+      let usedAt = new Map(uses.map(use => [use.date, use.usedAt])); // 日期 -> 最近一次显示的时间
+      let replaced = records.some(record => record.date === date); // 是否替换同一天的图片
+      let candidates = records.slice(0, -1).filter(record => record.date !== date).sort((a, b) => (usedAt.get(a.date) || a.fetchedAt) - (usedAt.get(b.date) || b.fetchedAt)); // 可以清理的图片，按最近一次显示的时间从早到晚排列，没有显示过时按下载的时间
+      let excess = records.length + (replaced ? 0 : 1) - wallpaperHistory; // 保存新图片后超出的数量
+      let usage = estimate.usage + incoming; // 保存新图片后的用量
+      let limit = estimate.quota * wallpaperQuotaRatio; // 用量的上限
+      let removed = []; // 要清理的图片的日期
+      for (let record of candidates) { // 从最久没有显示的图片开始清理
+        if (removed.length >= excess && usage <= limit) break; // 数量和用量都不超出时停止
+        removed.push(record.date); // 清理这张图片
+        usage -= getWallpaperSize(record); // 减去这张图片占用的空间
+      }
+      if (!removed.length) return; // 不需要清理
+      let write = db.transaction(["wallpapers", "wallpaperUses"], "readwrite"); // 创建读写事务
+      removed.forEach(date => { // 删除图片和显示时间
+        write.objectStore("wallpapers").delete(date); // 删除图片
+        write.objectStore("wallpaperUses").delete(date); // 删除显示时间
+      });
+      return transactionPromise(write); // 等待事务提交
+    });
+  });
+}
+
+// 按日期读取保存的图片，没有时为undefined
+function getWallpaper(date) {
+  return openDatabase().then(db => requestPromise(db.transaction("wallpapers").objectStore("wallpapers").get(date))); // 读取图片记录
+}
+
+// 保存一张图片
+function saveWallpaper(record) {
+  return openDatabase().then(db => { // 打开数据库
+    let transaction = db.transaction("wallpapers", "readwrite"); // 创建读写事务
+    transaction.objectStore("wallpapers").put(record); // 保存图片记录
+    return transactionPromise(transaction); // 等待事务提交
+  });
+}
+
+// 扩展安装、更新和浏览器启动时确保定时器存在
+chrome.runtime.onInstalled.addListener(scheduleWallpaper);
+chrome.runtime.onStartup.addListener(scheduleWallpaper);
+chrome.runtime.onStartup.addListener(resumeWallpaper);
+
+// 定时器触发时下载每日图片
+chrome.alarms.onAlarm.addListener(alarm => {
+  if (alarm.name === wallpaperAlarm) updateWallpaper(); // 下载每日图片
+});
+
+// 新标签页打开时发送getImage，确认定时器存在，有中断的下载时继续下载
+chrome.runtime.onMessage.addListener(message => {
+  if (message.action !== "getImage") return; // 只处理getImage
+  scheduleWallpaper(); // 确保定时器存在
+  resumeWallpaper(); // 继续中断的下载
+});
+
+// 修改了图片接口时立即重新下载
+chrome.storage.onChanged.addListener((changes, area) => {
+  if (area === "local" && changes.wallpaperEndpoint) updateWallpaper(); // 使用新的接口下载
+});
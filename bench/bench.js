@@ -0,0 +1,180 @@
+// 新标签页的性能测试：在无头Chrome中用内存版chrome.*接口打开newtab.html，
+// 测量不同规模和形状的收藏夹的首次渲染时间、切换文件夹的时间、样式计算和布局的次数、DOM节点数量和内存占用，
+// 和baseline.json中记录的基准比较，超过允许的范围时以非零状态退出
+//
+// 用法：node bench/bench.js [--update] [--runs=3] [--only=wide-10k]
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+const puppeteer = require("puppeteer");
+const {createTree, findLargestFolder, findDeepestFolder, findAncestors} = require("./trees");
+
+const root = path.join(__dirname, ".."); // 扩展的根目录
+const baselineFile = path.join(__dirname, "baseline.json"); // 基准文件
+const pageUrl = "file://" + path.join(root, "newtab.html"); // 新标签页的地址
+const mockSource = fs.readFileSync(path.join(__dirname, "chrome-mock.js"), "utf8"); // 内存版chrome.*接口，在页面中执行
+const sizes = {"1k": 1000, "10k": 10000, "100k": 100000}; // 收藏夹规模
+const shapes = ["wide", "deep"]; // 收藏夹形状
+const viewport = {width: 1280, height: 800}; // 页面的尺寸
+const timeout = 60000; // 单个场景的超时时间
+// 每个指标允许超过基准的比例和绝对值，时间的波动比次数和节点数量大
+const tolerance = {
+  renderMs: {ratio: 1.5, slack: 20},
+  renderStyles: {ratio: 1.2, slack: 3},
+  renderLayouts: {ratio: 1.2, slack: 3},
+  switchMs: {ratio: 1.5, slack: 10},
+  switchStyles: {ratio: 1.2, slack: 2},
+  switchLayouts: {ratio: 1.2, slack: 2},
+  switchMutations: {ratio: 1.1, slack: 10},
+  nodes: {ratio: 1.1, slack: 10},
+  heapMB: {ratio: 1.3, slack: 2}
+};
+
+const args = process.argv.slice(2); // 命令行参数
+const update = args.includes("--update"); // 是否更新基准
+const runs = Number((args.find(arg => arg.startsWith("--runs=")) || "--runs=3").slice(7)); // 每个场景运行的次数，取中位数
+const only = (args.find(arg => arg.startsWith("--only=")) || "").slice(7); // 只运行指定的场景
+const pageErrors = new Set(); // 页面中未捕获的错误，测试结束时输出一次
+
+// 在页面的脚本执行前安装chrome.*接口和测试钩子，newtab.js的状态是顶层的let和const，
+// 只能在同一个全局作用域的脚本里按名称访问，所以钩子在这里定义为函数，调用时才读取这些变量
+function preload(tree, storage) {
+  return `${mockSource}
+window.__benchMock = createChrome(window, JSON.parse(${JSON.stringify(JSON.stringify(tree))}), ${JSON.stringify(storage)}); // 收藏夹作为JSON字符串解析，层级很深的对象字面量会超出脚本解析的嵌套上限
+window.__bench = {
+  settled: () => bookmarksReady && shownShortcuts.folder === currentFolder && !pendingRender.scheduled && !shortcutWindow.scheduled,
+  folder: () => currentFolder,
+  select: id => selectFolder(id),
+  // 等待收藏夹渲染完成，返回完成时的页面时间，用MessageChannel轮询，不受定时器最小间隔的影响
+  waitSettled: folder => new Promise(resolve => {
+    let channel = new MessageChannel();
+    channel.port1.onmessage = () => folder !== undefined && currentFolder !== folder || !window.__bench.settled() ? channel.port2.postMessage(0) : resolve(performance.now());
+    channel.port2.postMessage(0);
+  }),
+  // 等待下一次绘制完成，样式计算和布局在绘制前进行
+  nextPaint: () => new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)))
+};`;
+}
+
+// 读取页面的性能指标，返回指标名称 -> 值
+async function getMetrics(client) {
+  let {metrics} = await client.send("Performance.getMetrics"); // 读取指标
+  return Object.fromEntries(metrics.map(metric => [metric.name, metric.value])); // 转换为对象
+}
+
+// 运行一次场景，返回各项指标，每次使用新的浏览器上下文，本地存储和IndexedDB都是空的
+async function runScenario(browser, tree, storage, switchTo) {
+  let context = await browser.createBrowserContext(); // 新的浏览器上下文
+  let page = await context.newPage(); // 新的页面
+  try {
+    await page.setViewport(viewport); // 设置页面尺寸
+    page.on("pageerror", error => pageErrors.add(error.message)); // 记录页面中未捕获的错误
+    await page.setRequestInterception(true); // 拦截网络请求
+    page.on("request", request => request.url().startsWith("file:") ? request.continue() : request.respond({status: 404, body: ""})); // 只加载本地文件，图标等外部请求一律返回404
+    await page.evaluateOnNewDocument(preload(tree, storage)); // 安装chrome.*接口和测试钩子
+    let client = await page.createCDPSession(); // 调试协议会话
+    await client.send("Performance.enable"); // 开始统计性能指标
+
+    await page.goto(pageUrl, {waitUntil: "domcontentloaded", timeout: timeout}); // 打开新标签页，脚本在解析时执行
+    let rendered = await page.evaluate("__bench.waitSettled()"); // 等待首次渲染完成，时间从导航开始计算
+    await page.evaluate("__bench.nextPaint()"); // 等待首次渲染的样式计算和布局
+    let metrics = await getMetrics(client); // 首次渲染后的指标
+    await client.send("HeapProfiler.collectGarbage"); // 整理内存
+    let heap = await getMetrics(client); // 整理后的堆大小
+    let result = {
+      renderMs: rendered, // 首次渲染时间
+      renderStyles: metrics.RecalcStyleCount, // 首次渲染时的样式计算次数
+      renderLayouts: metrics.LayoutCount, // 首次渲染时的布局次数
+      nodes: await page.evaluate(() => document.getElementsByTagName("*").length), // DOM节点数量
+      heapMB: heap.JSHeapUsedSize / 1048576 // 页面占用的内存
+    };
+
+    await page.evaluate(() => { // 统计切换文件夹时的DOM变化次数
+      window.__mutations = 0;
+      new MutationObserver(records => window.__mutations += records.length).observe(document.getElementById("bookmark-box"), {childList: true, subtree: true, attributes: true, characterData: true}); // 观察整个收藏夹区域
+    });
+    let before = await getMetrics(client); // 切换前的指标
+    let switched = await page.evaluate(id => { // 切换文件夹，和点击文件夹按钮的效果相同
+      let start = performance.now(); // 开始切换的时间
+      __bench.select(id);
+      return __bench.waitSettled(id).then(end => end - start); // 等待切换完成
+    }, switchTo);
+    await page.evaluate("__bench.nextPaint()"); // 等待切换后的样式计算和布局
+    let after = await getMetrics(client); // 切换后的指标
+    result.switchMs = switched; // 切换文件夹的时间
+    result.switchStyles = after.RecalcStyleCount - before.RecalcStyleCount; // 切换文件夹时的样式计算次数
+    result.switchLayouts = after.LayoutCount - before.LayoutCount; // 切换文件夹时的布局次数
+    result.switchMutations = await page.evaluate("__mutations"); // 切换文件夹时的DOM变化次数
+    result.calls = await page.evaluate("__benchMock.calls.bookmarks + __benchMock.calls.storage"); // 接口调用次数
+    return result; // 返回各项指标
+  } finally {
+    await context.close(); // 关闭浏览器上下文，释放内存
+  }
+}
+
+// 取多次运行结果的中位数
+function median(results, key) {
+  let values = results.map(result => result[key]).sort((a, b) => a - b); // 排序
+  return values[Math.floor(values.length / 2)]; // 取中间的值
+}
+
+// 准备一个场景：生成收藏夹，打开书签最多或层级最深的文件夹并展开到该文件夹，然后切换到它的上一层或相邻的文件夹
+function prepareScenario(shape, size) {
+  let tree = createTree(size, shape); // 生成收藏夹
+  let folder = shape === "deep" ? findDeepestFolder(tree) : findLargestFolder(tree); // 要打开的文件夹
+  let ancestors = findAncestors(tree, folder.id); // 需要展开的文件夹
+  let siblings = tree.children[0].children.filter(node => node.children && node.id !== folder.id); // 收藏夹栏中的其他文件夹
+  let switchTo = shape === "deep" ? folder.parentId : (siblings[0] || tree.children[0]).id; // 切换到的文件夹
+  let storage = {folder: folder.id, expandedFolders: ancestors}; // 打开的文件夹和展开状态
+  return {tree, storage, switchTo}; // 返回场景
+}
+
+// 判断一项指标是否超过基准允许的范围
+function isRegression(key, value, base) {
+  let limit = tolerance[key]; // 允许的范围
+  return limit && base !== undefined && value > base * limit.ratio + limit.slack; // 超过比例和绝对值之和时算作退步
+}
+
+async function main() {
+  let baseline = fs.existsSync(baselineFile) ? JSON.parse(fs.readFileSync(baselineFile, "utf8")) : {}; // 读取基准
+  let report = {}; // 本次测试结果
+  let failures = []; // 退步的指标
+  let browser = await puppeteer.launch({headless: "shell", args: ["--no-sandbox"]}); // 启动无头Chrome
+  try {
+    for (let shape of shapes) {
+      for (let [label, size] of Object.entries(sizes)) {
+        let name = `${shape}-${label}`; // 场景名称
+        if (only && only !== name) continue; // 跳过没有指定的场景
+        let scenario = prepareScenario(shape, size); // 准备场景
+        let results = []; // 每次运行的结果
+        for (let i = 0; i < runs; i++) results.push(await runScenario(browser, scenario.tree, scenario.storage, scenario.switchTo)); // 运行场景
+        let result = {}; // 中位数结果
+        for (let key of Object.keys(results[0])) result[key] = Math.round(median(results, key) * 10) / 10; // 保留一位小数
+        report[name] = result; // 记录结果
+        let base = baseline[name] || {}; // 该场景的基准
+        let marks = Object.keys(result).filter(key => isRegression(key, result[key], base[key])); // 退步的指标
+        marks.forEach(key => failures.push(`${name} ${key}: ${result[key]}，基准为${base[key]}`)); // 记录退步
+        console.log([name.padEnd(10), ...Object.entries(result).map(([key, value]) => `${key}=${value}${marks.includes(key) ? "!" : ""}`)].join("  ")); // 输出结果
+      }
+    }
+  } finally {
+    await browser.close(); // 关闭浏览器
+  }
+
+  if (pageErrors.size) console.warn("页面中的错误：\n" + [...pageErrors].join("\n")); // 输出页面中的错误
+  if (update) { // 更新基准
+    fs.writeFileSync(baselineFile, JSON.stringify(Object.assign(baseline, report), null, 2) + "\n"); // 写入基准文件
+    console.log(`已更新 ${path.relative(root, baselineFile)}`);
+  } else if (!Object.keys(baseline).length) { // 还没有基准
+    console.log("还没有基准，使用--update记录本次结果");
+  } else if (failures.length) { // 有退步的指标
+    console.error("性能退步：\n" + failures.join("\n")); // 输出退步的指标
+    process.exitCode = 1; // 以非零状态退出
+  }
+}
+
+main().catch(error => {
+  console.error(error); // 输出错误
+  process.exitCode = 1; // 以非零状态退出
+});
@@ -0,0 +1,152 @@
+// 性能测试用的内存版chrome.*接口，只实现新标签页用到的部分，回调和真实接口一样异步执行，
+// 性能测试把这个文件作为脚本注入到页面中执行，在Node中也可以作为模块引用
+"use strict";
+
+// 创建一个异步执行函数的方法，真实接口的回调通过进程间消息返回，不受嵌套定时器最小4毫秒间隔的限制，所以用MessageChannel模拟
+function createDefer(window) {
+  let queue = []; // 等待执行的函数
+  let channel = new window.MessageChannel(); // 消息通道
+  channel.port1.onmessage = () => queue.shift()(); // 每条消息执行一个函数
+  return fn => {
+    queue.push(fn); // 加入队列
+    channel.port2.postMessage(0); // 发送消息
+  };
+}
+
+// 创建一个事件对象，dispatch用于在测试中触发事件
+function createEvent(defer) {
+  let listeners = []; // 监听函数列表
+  return {
+    addListener: fn => listeners.push(fn), // 添加监听函数
+    removeListener: fn => listeners = listeners.filter(item => item !== fn), // 移除监听函数
+    hasListener: fn => listeners.includes(fn), // 是否有该监听函数
+    dispatch: (...args) => defer(() => listeners.forEach(fn => fn(...args))) // 异步触发事件
+  };
+}
+
+// 复制一个节点，不包含子节点，和getChildren返回的节点一样
+function copyNode(node) {
+  let copy = {id: node.id, parentId: node.parentId, index: node.index, title: node.title}; // 复制基本属性
+  if (node.url) copy.url = node.url; // 书签有链接
+  return copy; // 返回复制的节点
+}
+
+// 复制一个节点和它的所有子节点，和getTree返回的节点一样
+function copyTree(node) {
+  let copy = copyNode(node); // 复制节点
+  if (node.children) copy.children = node.children.map(copyTree); // 复制子节点
+  return copy; // 返回复制的节点
+}
+
+// 在window中安装chrome.*接口，tree为收藏夹根节点，storage为chrome.storage.local的初始内容
+function createChrome(window, tree, storage) {
+  let nodes = new Map(); // 节点id -> 节点
+  let stack = [tree]; // 待处理的节点栈
+  while (stack.length) { // 建立节点索引
+    let node = stack.pop(); // 取出一个节点
+    nodes.set(node.id, node); // 记录节点
+    if (node.children) stack.push(...node.children); // 继续遍历子节点
+  }
+  let store = JSON.parse(JSON.stringify(storage || {})); // chrome.storage.local的内容
+  let calls = {bookmarks: 0, storage: 0}; // 接口调用次数，用于报告
+  let defer = createDefer(window); // 异步执行回调的方法
+
+  let chrome = {runtime: {id: "bench", lastError: undefined}}; // chrome对象
+
+  // 异步执行回调，error不为空时在回调期间设置chrome.runtime.lastError
+  let reply = (callback, result, error) => {
+    if (!callback) return error ? Promise.reject(new Error(error)) : Promise.resolve(result); // 没有回调时返回Promise
+    defer(() => {
+      chrome.runtime.lastError = error ? {message: error} : undefined; // 设置错误信息
+      try {
+        callback(result); // 执行回调
+      } finally {
+        chrome.runtime.lastError = undefined; // 清除错误信息
+      }
+    });
+  };
+  // 根据id查找节点，找不到时返回null
+  let find = id => nodes.get(String(id)) || null;
+  let missing = "Can't find bookmark for id."; // 找不到节点时的错误信息
+
+  chrome.bookmarks = {
+    // 获取整个收藏夹树
+    getTree: callback => (calls.bookmarks++, reply(callback, [copyTree(tree)])),
+    // 获取一个文件夹的子节点
+    getChildren: (id, callback) => {
+      calls.bookmarks++; // 记录调用次数
+      let node = find(id); // 查找文件夹
+      return node ? reply(callback, (node.children || []).map(copyNode)) : reply(callback, undefined, missing); // 返回子节点
+    },
+    // 获取一个节点和它的所有子节点
+    getSubTree: (id, callback) => {
+      calls.bookmarks++; // 记录调用次数
+      let node = find(id); // 查找节点
+      return node ? reply(callback, [copyTree(node)]) : reply(callback, undefined, missing); // 返回子树
+    },
+    // 获取一个或多个节点
+    get: (ids, callback) => {
+      calls.bookmarks++; // 记录调用次数
+      let list = [].concat(ids).map(find); // 查找所有节点
+      return list.every(Boolean) ? reply(callback, list.map(copyNode)) : reply(callback, undefined, missing); // 返回节点
+    },
+    onCreated: createEvent(defer), // 创建书签事件
+    onRemoved: createEvent(defer), // 删除书签事件
+    onChanged: createEvent(defer), // 修改书签事件
+    onMoved: createEvent(defer), // 移动书签事件
+    onChildrenReordered: createEvent(defer), // 子节点重新排序事件
+    onImportBegan: createEvent(defer), // 开始导入事件
+    onImportEnded: createEvent(defer) // 导入结束事件
+  };
+
+  // 把get的参数转换为默认值对象，null表示获取全部
+  let getDefaults = keys => {
+    if (keys === null || keys === undefined) return null; // 获取全部
+    if (typeof keys === "string") return {[keys]: undefined}; // 单个键
+    if (Array.isArray(keys)) return Object.fromEntries(keys.map(key => [key, undefined])); // 键数组
+    return keys; // 带默认值的对象
+  };
+  // 复制一个值，模拟存储时的序列化
+  let clone = value => value === undefined ? undefined : JSON.parse(JSON.stringify(value));
+
+  chrome.storage = {
+    local: {
+      // 读取数据
+      get: (keys, callback) => {
+        calls.storage++; // 记录调用次数
+        if (typeof keys === "function") [keys, callback] = [null, keys]; // 只传了回调
+        let defaults = getDefaults(keys); // 默认值
+        let result = {}; // 读取结果
+        for (let key of Object.keys(defaults || store)) { // 遍历要读取的键
+          let value = key in store ? store[key] : defaults[key]; // 读取值或默认值
+          if (value !== undefined) result[key] = clone(value); // 只返回有值的键
+        }
+        return reply(callback, result); // 返回结果
+      },
+      // 保存数据
+      set: (items, callback) => {
+        calls.storage++; // 记录调用次数
+        for (let key of Object.keys(items)) store[key] = clone(items[key]); // 保存每个键
+        return reply(callback); // 完成
+      },
+      // 删除数据
+      remove: (keys, callback) => {
+        calls.storage++; // 记录调用次数
+        for (let key of [].concat(keys)) delete store[key]; // 删除每个键
+        return reply(callback); // 完成
+      }
+    },
+    onChanged: createEvent(defer) // 数据变化事件
+  };
+
+  chrome.runtime.getURL = path => `chrome-extension://bench/${String(path).replace(/^\//, "")}`; // 获取扩展内文件的链接
+  // 发送消息，没有后台脚本，有回调时和真实接口一样报告没有接收方，没有回调时直接忽略，避免未处理的Promise拒绝使测试退出
+  chrome.runtime.sendMessage = (message, callback) => callback ? reply(callback, undefined, "Could not establish connection. Receiving end does not exist.") : Promise.resolve();
+  chrome.runtime.onMessage = createEvent(defer); // 消息事件
+  chrome.tabs = {create: (options, callback) => reply(callback, {id: 1, url: options.url})}; // 打开标签页
+
+  window.chrome = chrome; // 安装到window
+  return {chrome, store, calls}; // 返回chrome对象、存储内容和调用次数
+}
+
+if (typeof module === "object") module.exports = {createChrome}; // 作为模块引用时导出
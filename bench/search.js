@@ -0,0 +1,119 @@
+// 收藏夹搜索的延迟测试：用5万个书签的合成收藏夹建立搜索索引，按输入的顺序逐个字符查询，
+// 每次查询都需要在一帧（16毫秒）内返回，结果需要和遍历所有书签计算出的排名相同，
+// 再删除排名靠前的书签检查排名不够时的遍历，有检查失败时以非零状态退出
+//
+// 用法：node bench/search.js [--runs=5]
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+const vm = require("vm");
+const {createTree} = require("./trees");
+
+const root = path.join(__dirname, ".."); // 扩展的根目录
+const size = 50000; // 收藏夹的节点数量
+const budgetMs = 16; // 每次查询的时间上限，一帧的时间
+const queries = ["site12", "page", "example site 1", "示例网站", "shiliwangzhan", "slwz", "com"]; // 逐个字符输入的查询
+const args = process.argv.slice(2); // 命令行参数
+const runs = Number((args.find(arg => arg.startsWith("--runs=")) || "--runs=5").slice(7)); // 每个查询运行的次数，取中位数
+
+// search-index.js在搜索线程中作为普通脚本执行，函数都在全局作用域，这里也在全局作用域执行，
+// vm的独立上下文中每次调用全局函数都要经过拦截器，测出的时间会偏大；拼音字典从扩展目录读取
+global.fetch = file => Promise.resolve({json: () => JSON.parse(fs.readFileSync(path.join(root, file), "utf8"))});
+vm.runInThisContext(fs.readFileSync(path.join(root, "search-index.js"), "utf8"), {filename: "search-index.js"});
+
+// 取出收藏夹中的所有书签
+function collectBookmarks(tree) {
+  let bookmarks = []; // 书签
+  let stack = [tree]; // 待处理的节点栈
+  while (stack.length) { // 当栈中还有节点时
+    let node = stack.pop(); // 取出一个节点
+    if (node.url) bookmarks.push(node); // 记录书签
+    else stack.push(...node.children); // 继续遍历子节点
+  }
+  return bookmarks; // 返回书签
+}
+
+// 遍历所有书签计算排名，用于检查索引查询的结果，一两个字符的词只匹配词首，和词首索引一致
+function expectedResults(index, query) {
+  let terms = normalizeSearchText(query).trim().split(/\s+/).filter(Boolean); // 查询中的词
+  let starts = terms.filter(term => term.length < 3).map(term => new Set(index.prefixes.get(term))); // 短词所在词首的书签序号
+  let results = []; // [分数, 书签]
+  index.docs.forEach((entry, doc) => { // 按加入索引的顺序遍历，分数相同时先加入的靠前
+    if (!entry || starts.some(docs => !docs.has(doc))) return; // 跳过已经删除或短词不在词首的书签
+    let score = scoreSearchEntry(entry, terms); // 计算匹配程度
+    if (score >= 0) results.push([score, entry]); // 记录匹配的书签
+  });
+  results.sort((a, b) => b[0] - a[0]); // 稳定排序，按分数从高到低
+  return results.slice(0, searchResultLimit).map(([, entry]) => entry.id); // 前几个书签的id
+}
+
+// 取多次运行结果的中位数
+function median(values) {
+  values = values.slice().sort((a, b) => a - b); // 排序
+  return values[Math.floor(values.length / 2)]; // 取中间的值
+}
+
+// 逐个字符输入查询，返回每次查询的名称和时间，同时检查结果
+function typeQueries(index, failures) {
+  let timings = []; // [查询, 时间]
+  for (let query of queries) { // 每个查询
+    let times = []; // 每个字符多次运行的时间
+    for (let run = 0; run < runs; run++) { // 多次运行
+      index.last = null; // 从头开始输入
+      for (let end = 1; end <= query.length; end++) { // 每输入一个字符查询一次，和搜索框一样沿用上一次的结果
+        let typed = query.slice(0, end); // 已经输入的内容
+        if (!typed.trim()) continue; // 空格不查询
+        let start = performance.now(); // 开始时间
+        let ids = searchBookmarks(index, typed).map(entry => entry.id); // 查询
+        (times[end] = times[end] || []).push(performance.now() - start); // 记录时间
+        if (run) continue; // 结果只检查一次
+        let expected = expectedResults(index, typed); // 遍历得到的结果
+        if (ids.join() !== expected.join()) failures.push(`“${typed}”的结果为 ${ids.join()}，应为 ${expected.join()}`); // 结果不同
+      }
+    }
+    times.forEach((values, end) => timings.push([query.slice(0, end), median(values)])); // 每个字符取中位数
+  }
+  return timings;
+}
+
+async function main() {
+  let failures = []; // 失败的检查
+  let index = createSearchIndex(await loadPinyin()); // 和搜索线程一样使用拼音字典
+  let bookmarks = collectBookmarks(createTree(size, "wide")); // 合成收藏夹中的书签
+  let start = performance.now(); // 开始建立索引的时间
+  for (let node of bookmarks) addSearchEntry(index, node); // 建立索引
+  console.log(`${bookmarks.length}个书签，建立索引 ${(performance.now() - start).toFixed(0)}ms`);
+
+  let timings = typeQueries(index, failures); // 逐个字符输入
+  for (let [typed, ms] of timings) { // 输出每次查询的时间
+    console.log(`${ms > budgetMs ? "超时" : "通过"}  ${ms.toFixed(2).padStart(6)}ms  ${typed}`);
+    if (ms > budgetMs) failures.push(`“${typed}”用了 ${ms.toFixed(2)}ms，超过 ${budgetMs}ms`); // 超过一帧
+  }
+
+  let mixed = createSearchIndex(null); // 候选书签来自三字索引时短词也只匹配词首，合成收藏夹中三字索引的候选书签总是更多，用单独的小索引检查
+  for (let i = 0; i < 20; i++) addSearchEntry(mixed, {id: "s" + i, title: "site " + i, url: `https://site${i}.com/`}); // 很多书签以s开头
+  addSearchEntry(mixed, {id: "ys", title: "example", url: "https://x.com/ys"}); // s只出现在词的中间
+  for (let query of ["s", "example s", "s example"]) { // 单独的短词和混合长短词的查询
+    let ids = searchBookmarks(mixed, query).map(entry => entry.id); // 查询
+    let expected = expectedResults(mixed, query); // 遍历得到的结果
+    if (ids.join() !== expected.join()) failures.push(`混合查询“${query}”的结果为 ${ids.join()}，应为 ${expected.join()}`); // 结果不同
+  }
+
+  for (let prefix of ["s", "p", "示"]) { // 删除排名靠前的书签，剩下的不够时需要遍历
+    for (let entry of searchBookmarks(index, prefix, searchTopLimit)) removeSearchEntry(index, entry.id); // 删除排名中的所有书签
+    let ids = searchBookmarks(index, prefix).map(entry => entry.id); // 查询
+    let expected = expectedResults(index, prefix); // 遍历得到的结果
+    if (ids.join() !== expected.join()) failures.push(`删除后“${prefix}”的结果为 ${ids.join()}，应为 ${expected.join()}`); // 结果不同
+  }
+
+  if (failures.length) { // 有失败的检查
+    console.error("\n" + failures.join("\n")); // 输出失败的检查
+    process.exitCode = 1; // 以非零状态退出
+  }
+}
+
+main().catch(error => {
+  console.error(error); // 输出错误
+  process.exitCode = 1; // 以非零状态退出
+});
@@ -0,0 +1,90 @@
+// 性能测试用的合成收藏夹，按节点数量和形状生成，结构和chrome.bookmarks.getTree返回的一致
+"use strict";
+
+// 生成一个收藏夹树，size为书签和文件夹的总数，shape为wide（少量文件夹，每个文件夹有很多书签）或deep（一层套一层的文件夹）
+function createTree(size, shape) {
+  let nextId = 10; // 下一个节点的id，0到9留给根节点和顶层文件夹
+  let count = 0; // 已经生成的节点数量
+  let root = {id: "0", title: "", children: []}; // 根节点
+  let bar = {id: "1", parentId: "0", index: 0, title: "收藏夹栏", children: []}; // 收藏夹栏
+  let other = {id: "2", parentId: "0", index: 1, title: "其他收藏夹", children: []}; // 其他收藏夹
+  root.children.push(bar, other); // 添加顶层文件夹
+
+  // 在文件夹中添加一个子节点
+  let add = (parent, node) => {
+    node.id = String(nextId++); // 设置节点id
+    node.parentId = parent.id; // 设置父节点id
+    node.index = parent.children.length; // 设置节点在父节点中的位置
+    parent.children.push(node); // 添加到父节点
+    count++; // 节点数量加一
+    return node; // 返回节点
+  };
+  // 添加一个书签
+  let addBookmark = (parent, n) => add(parent, {
+    title: n % 3 ? `示例网站 ${n}` : `Example site ${n}`, // 标题中混合中文和英文
+    url: `https://site${n % 997}.example.com/page/${n}` // 链接的域名有重复，接近真实的收藏夹
+  });
+  // 添加一个文件夹
+  let addFolder = (parent, title) => add(parent, {title: title, children: []});
+
+  if (shape === "deep") { // 一层套一层的文件夹，每层有50个书签
+    let folder = bar; // 当前文件夹
+    let depth = 0; // 当前层级
+    while (count < size) { // 直到生成足够的节点
+      for (let i = 0; i < 50 && count < size; i++) addBookmark(folder, count); // 添加50个书签
+      if (count < size) folder = addFolder(folder, `第${++depth}层`); // 添加下一层文件夹
+    }
+  } else { // 少量文件夹，每个文件夹有500个书签
+    while (count < size) { // 直到生成足够的节点
+      let folder = addFolder(bar, `文件夹${bar.children.length + 1}`); // 添加一个文件夹
+      for (let i = 0; i < 500 && count < size; i++) addBookmark(folder, count); // 添加500个书签
+    }
+  }
+  return root; // 返回根节点
+}
+
+// 找到书签最多的文件夹，性能测试会打开这个文件夹
+function findLargestFolder(root) {
+  let largest = null; // 书签最多的文件夹
+  let stack = [root]; // 待处理的节点栈
+  while (stack.length) { // 当栈中还有节点时
+    let node = stack.pop(); // 取出一个节点
+    if (!node.children) continue; // 跳过书签
+    let bookmarks = node.children.filter(child => child.url).length; // 该文件夹的书签数量
+    if (!largest || bookmarks > largest.bookmarks) largest = {node: node, bookmarks: bookmarks}; // 记录书签最多的文件夹
+    stack.push(...node.children); // 继续遍历子节点
+  }
+  return largest.node; // 返回书签最多的文件夹
+}
+
+// 找到层级最深的文件夹，深层收藏夹的性能测试会打开这个文件夹
+function findDeepestFolder(root) {
+  let deepest = {node: root, depth: 0}; // 层级最深的文件夹
+  let stack = [{node: root, depth: 0}]; // 待处理的节点栈
+  while (stack.length) { // 当栈中还有节点时
+    let item = stack.pop(); // 取出一个节点
+    if (item.depth > deepest.depth) deepest = item; // 记录层级最深的文件夹
+    for (let child of item.node.children) { // 遍历子节点
+      if (child.children) stack.push({node: child, depth: item.depth + 1}); // 只处理文件夹
+    }
+  }
+  return deepest.node; // 返回层级最深的文件夹
+}
+
+// 找到一个文件夹的所有祖先文件夹的id，用于在文件夹树中展开到该文件夹
+function findAncestors(root, id) {
+  let parents = new Map(); // 节点id -> 父节点id
+  let stack = [root]; // 待处理的节点栈
+  while (stack.length) { // 当栈中还有节点时
+    let node = stack.pop(); // 取出一个节点
+    for (let child of node.children || []) { // 遍历子节点
+      parents.set(child.id, node.id); // 记录父节点
+      stack.push(child); // 继续遍历
+    }
+  }
+  let ancestors = []; // 祖先文件夹的id
+  for (let parent = parents.get(id); parent && parent !== root.id; parent = parents.get(parent)) ancestors.push(parent); // 一直向上查找到根节点
+  return ancestors; // 返回祖先文件夹的id
+}
+
+module.exports = {createTree, findLargestFolder, findDeepestFolder, findAncestors};
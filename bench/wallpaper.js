@@ -0,0 +1,312 @@
+// 每日图片下载的测试：用本地的HTTP服务器代替必应的接口和图片，返回ETag和Last-Modified，支持304和206，
+// 在无头Chrome中用内存版chrome.*接口加载idb.js和background.js，IndexedDB使用浏览器自带的，
+// 依次检查首次下载、条件请求、内容不变、中断后继续、中断期间图片变化、进度已经完整、416、弱ETag时继续和压缩传输等情况，有检查失败时以非零状态退出
+//
+// 用法：node bench/wallpaper.js
+"use strict";
+
+const crypto = require("crypto");
+const fs = require("fs");
+const http = require("http");
+const path = require("path");
+const puppeteer = require("puppeteer");
+const zlib = require("zlib");
+
+const root = path.join(__dirname, ".."); // 扩展的根目录
+const files = {"/idb.js": "idb.js", "/background.js": "background.js", "/chrome-mock.js": "bench/chrome-mock.js"}; // 服务器提供的本地文件
+const date = "20261015"; // 接口返回的图片日期
+const cutDelay = 300; // 中断连接前等待的时间，让页面先写入已经收到的数据块，单位为毫秒
+// 测试页面，先安装chrome.*接口，再按manifest.json中的顺序加载后台脚本，background.js中的importScripts由页面中的script标签代替
+const page = `<!doctype html>
+<meta charset="utf-8">
+<script src="/chrome-mock.js"></script>
+<script>
+window.__wallpaperMock = createChrome(window, {id: "0", title: "", children: []}, {wallpaperEndpoint: location.origin + "/api"});
+let alarms = {}; // 已经创建的定时器
+chrome.alarms = {get: (name, callback) => callback(alarms[name]), create: (name, options) => alarms[name] = Object.assign({name: name}, options), onAlarm: createEvent(createDefer(window))};
+chrome.runtime.onInstalled = createEvent(createDefer(window));
+chrome.runtime.onStartup = createEvent(createDefer(window));
+self.importScripts = () => {};
+</script>
+<script src="/idb.js"></script>
+<script src="/background.js"></script>
+`;
+
+// 服务器的状态，测试中直接修改
+const server = {
+  info: {title: "", copyright: ""}, // 接口返回的图片信息
+  image: Buffer.alloc(0), // 图片的内容
+  etag: "", // 图片的ETag
+  modified: "", // 图片的Last-Modified
+  cut: 0, // 大于0时图片发送这么多字节后中断连接，只中断一次
+  gzip: false, // 为true时完整的图片压缩后发送，Content-Length是压缩后的长度
+  log: [] // 收到的请求，每项为“路径 状态 Range”
+};
+
+// 计算数据的SHA-256哈希值，和background.js中的hashBuffer结果相同
+function hash(buffer) {
+  return crypto.createHash("sha256").update(buffer).digest("hex");
+}
+
+// 更换服务器上的图片，etag不同时也更新Last-Modified
+function setImage(image, etag) {
+  server.image = image; // 图片的内容
+  server.etag = etag; // 图片的ETag
+  server.modified = new Date(Date.now() + server.log.length * 1000).toUTCString(); // 每次更换都是不同的修改时间
+}
+
+// 发送图片的全部或一部分，server.cut大于0时发送到该位置后等待一会儿再中断连接
+function sendImage(response, status, headers, body) {
+  response.writeHead(status, Object.assign({"Content-Type": "image/jpeg", "Content-Length": body.length, "ETag": server.etag, "Last-Modified": server.modified, "Accept-Ranges": "bytes"}, headers)); // 响应头
+  if (!server.cut || server.cut >= body.length) return response.end(body); // 完整发送
+  let cut = server.cut; // 中断的位置
+  server.cut = 0; // 只中断一次
+  response.write(body.subarray(0, cut), () => setTimeout(() => response.destroy(), cutDelay)); // 发送一部分后中断
+}
+
+// 处理一个请求
+function handle(request, response) {
+  let url = new URL(request.url, "http://localhost"); // 请求的地址
+  let log = status => server.log.push([url.pathname, status, request.headers.range || ""].join(" ").trim()); // 记录请求
+  if (files[url.pathname]) { // 本地文件
+    response.writeHead(200, {"Content-Type": "text/javascript; charset=utf-8"});
+    return response.end(fs.readFileSync(path.join(root, files[url.pathname])));
+  }
+  if (url.pathname === "/") { // 测试页面
+    response.writeHead(200, {"Content-Type": "text/html; charset=utf-8"});
+    return response.end(page);
+  }
+  if (url.pathname === "/api") { // 图片接口，ETag由内容决定
+    let body = JSON.stringify({images: [Object.assign({startdate: date, url: "/image.jpg"}, server.info)]}); // 接口返回的内容
+    let etag = `"${hash(body).slice(0, 16)}"`; // 接口的ETag
+    if (request.headers["if-none-match"] === etag) return log(304), response.writeHead(304, {"ETag": etag}), response.end(); // 没有变化
+    log(200);
+    response.writeHead(200, {"Content-Type": "application/json", "ETag": etag, "Last-Modified": server.modified});
+    return response.end(body);
+  }
+  if (url.pathname === "/image.jpg") { // 图片
+    let size = server.image.length; // 图片的大小
+    let range = /^bytes=(\d+)-$/.exec(request.headers.range || ""); // 请求的范围，只支持从某个位置到结尾
+    let ifRange = request.headers["if-range"]; // 继续下载时的验证信息
+    let strong = !server.etag.startsWith("W/"); // If-Range中的弱ETag不能匹配
+    if (range && (!ifRange || strong && ifRange === server.etag || ifRange === server.modified)) { // 图片没有变化时按范围发送
+      let start = Number(range[1]); // 开始的位置
+      if (start >= size) return log(416), response.writeHead(416, {"Content-Range": `bytes */${size}`}), response.end(); // 范围无效
+      log(206);
+      return sendImage(response, 206, {"Content-Range": `bytes ${start}-${size - 1}/${size}`}, server.image.subarray(start));
+    }
+    if (!range && request.headers["if-none-match"] === server.etag) return log(304), response.writeHead(304, {"ETag": server.etag}), response.end(); // 没有变化
+    log(200);
+    if (server.gzip) return sendImage(response, 200, {"Content-Encoding": "gzip"}, zlib.gzipSync(server.image)); // 压缩后发送
+    return sendImage(response, 200, {}, server.image); // 发送完整的图片
+  }
+  log(404);
+  response.writeHead(404);
+  response.end();
+}
+
+// 在页面中生成一张随机内容的JPEG，足够大才能分成多个数据块
+function createImage(tab) {
+  return tab.evaluate(() => {
+    let canvas = new OffscreenCanvas(1600, 900); // 宽度大于最小的缩小版本
+    let context = canvas.getContext("2d");
+    let data = context.createImageData(canvas.width, canvas.height); // 随机的像素，JPEG压缩后仍然很大
+    for (let i = 0; i < data.data.length; i++) data.data[i] = i % 4 === 3 ? 255 : Math.random() * 256;
+    context.putImageData(data, 0, 0);
+    return canvas.convertToBlob({type: "image/jpeg", quality: 0.9}).then(blob => blob.arrayBuffer()).then(buffer => Array.from(new Uint8Array(buffer)));
+  }).then(bytes => Buffer.from(bytes));
+}
+
+// 读取页面中保存的图片、数据块、下载进度和本地存储
+function getState(tab) {
+  return tab.evaluate(date => openDatabase().then(db => Promise.all([
+    getWallpaper(date),
+    requestPromise(db.transaction("wallpaperChunks").objectStore("wallpaperChunks").count())
+  ])).then(([record, chunks]) => {
+    let store = window.__wallpaperMock.store; // 本地存储
+    return {
+      record: record && {hash: record.hash, title: record.title, etag: record.etag, size: record.blob.size, variants: record.variants.length, placeholder: !!record.placeholder},
+      chunks: chunks,
+      download: store.wallpaperDownload || null,
+      wallpaper: store.wallpaper || null,
+      info: store.wallpaperInfo || null
+    };
+  }), date);
+}
+
+// 在页面中写入一个已经接收完整但还没有合并的下载，模拟合并数据块前后台脚本被挂起
+function storeDownload(tab, image, chunkSize) {
+  let chunks = []; // 按chunkSize分块的图片内容
+  for (let start = 0; start < image.length; start += chunkSize) chunks.push(Array.from(image.subarray(start, start + chunkSize)));
+  return tab.evaluate((chunks, progress) => openDatabase().then(db => {
+    let transaction = db.transaction("wallpaperChunks", "readwrite"); // 写入数据块
+    chunks.forEach((bytes, index) => transaction.objectStore("wallpaperChunks").put({index: index, blob: new Blob([new Uint8Array(bytes)])}));
+    return transactionPromise(transaction);
+  }).then(() => new Promise(resolve => chrome.storage.local.set({wallpaperDownload: Object.assign(progress, {url: location.origin + "/image.jpg", chunks: chunks.length})}, resolve))), chunks, {type: "image/jpeg", size: image.length, received: image.length, etag: server.etag, lastModified: server.modified});
+}
+
+async function main() {
+  let failures = []; // 失败的检查
+  let listener = http.createServer(handle); // 本地的测试服务器
+  await new Promise(resolve => listener.listen(0, "127.0.0.1", resolve)); // 使用随机的端口
+  let origin = `http://127.0.0.1:${listener.address().port}`; // 服务器的地址
+  let browser = await puppeteer.launch({headless: "shell", args: ["--no-sandbox"]}); // 启动无头Chrome
+  try {
+    let tab = await browser.newPage(); // 测试页面
+    let pageErrors = []; // 页面中未捕获的错误
+    tab.on("pageerror", error => pageErrors.push(error.message));
+    await tab.goto(origin + "/", {waitUntil: "load"}); // 加载后台脚本
+    let chunkSize = await tab.evaluate(() => wallpaperChunkSize); // 后台脚本写入数据块的大小
+
+    // 运行一个场景：prepare修改服务器，run在页面中执行，verify检查结果，每个场景开始前清空请求记录
+    let scenario = async (name, prepare, run, verify) => {
+      await prepare();
+      server.log = [];
+      let error = await tab.evaluate(run).then(() => "", error => String(error)); // 运行，记录错误
+      let state = await getState(tab); // 运行后的状态
+      let problems = []; // 这个场景中失败的检查
+      verify(state, (ok, message) => ok || problems.push(message), error);
+      if (pageErrors.length) problems.push("页面中的错误：" + pageErrors.splice(0).join("; "));
+      problems.forEach(message => failures.push(`${name}：${message}`)); // 记录失败
+      console.log(`${problems.length ? "失败" : "通过"}  ${name}  ${server.log.join(", ")}`); // 输出结果
+    };
+    let download = "updateWallpaper()"; // 和定时器触发时一样下载，失败时不抛出错误
+    let expectLog = (check, expected) => check(server.log.join(", ") === expected.join(", "), `请求为 ${server.log.join(", ")}，应为 ${expected.join(", ")}`);
+    let expectImage = (state, check, image) => {
+      check(state.record && state.record.hash === hash(image), "保存的图片和服务器上的不同");
+      check(!state.download && !state.chunks, `下载进度没有清除：${state.chunks}个数据块`);
+    };
+    let fetchedAt = 0; // 首次下载时通知新标签页的下载时间，图片变化时才更新
+    let images = []; // 测试用的图片
+    for (let i = 0; i < 9; i++) images.push(await createImage(tab));
+
+    await scenario("首次下载", () => {
+      server.info = {title: "A", copyright: "a"};
+      setImage(images[0], '"a"');
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200", "/image.jpg 200"]);
+      expectImage(state, check, images[0]);
+      check(state.record && state.record.variants > 0 && state.record.placeholder, "没有生成占位图和缩小版本");
+      check(state.info && state.info.etag, "没有保存接口的ETag");
+      check(state.wallpaper && state.wallpaper.date === date, "没有通知新标签页");
+      fetchedAt = state.wallpaper ? state.wallpaper.fetchedAt : 0;
+    });
+
+    await scenario("接口没有变化时不请求图片", () => {}, download, (state, check) => {
+      expectLog(check, ["/api 304"]);
+      check(state.wallpaper.fetchedAt === fetchedAt, "新标签页被通知了图片变化");
+    });
+
+    await scenario("图片返回304", () => {
+      server.info.title = "B";
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200", "/image.jpg 304"]);
+      check(state.record && state.record.title === "B", "没有更新图片信息");
+      check(state.wallpaper.fetchedAt === fetchedAt, "新标签页被通知了图片变化");
+    });
+
+    await scenario("ETag变化但内容相同", () => {
+      server.info.title = "C";
+      setImage(images[0], '"a2"');
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200", "/image.jpg 200"]);
+      check(state.record && state.record.etag === '"a2"', "没有更新图片的ETag");
+      check(state.wallpaper.fetchedAt === fetchedAt, "内容相同时也通知了新标签页");
+    });
+
+    await scenario("图片变化", () => {
+      server.info.title = "D";
+      setImage(images[1], '"b"');
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200", "/image.jpg 200"]);
+      expectImage(state, check, images[1]);
+      check(state.wallpaper.fetchedAt !== fetchedAt, "没有通知新标签页");
+    });
+
+    let received = 0; // 中断时已经收到的字节数
+    await scenario("下载中断", () => {
+      server.info.title = "E";
+      setImage(images[2], '"c"');
+      server.cut = Math.floor(images[2].length / 2); // 发送一半后中断
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200", "/image.jpg 200"]);
+      received = state.download ? state.download.received : 0;
+      check(received > 0 && received < images[2].length, `下载进度不正确：${received}`);
+      check(state.chunks > 0 && state.chunks === state.download.chunks, `数据块和进度不一致：${state.chunks}个数据块`);
+      check(state.record && state.record.hash === hash(images[1]), "没有下载完整时替换了图片");
+    });
+    await scenario("从中断的位置继续", () => {}, download, (state, check) => {
+      expectLog(check, ["/api 200", `/image.jpg 206 bytes=${received}-`]);
+      expectImage(state, check, images[2]);
+    });
+
+    await scenario("中断期间图片变化", () => {
+      server.info.title = "F";
+      setImage(images[3], '"d"');
+      server.cut = Math.floor(images[3].length / 2);
+    }, () => updateWallpaper().then(() => chrome.storage.local.get("wallpaperDownload")).then(data => {
+      if (!data.wallpaperDownload) throw new Error("没有中断");
+    }), () => {});
+    await scenario("If-Range不匹配时重新下载", () => {
+      setImage(images[4], '"e"');
+    }, download, (state, check) => {
+      check(server.log.length === 2 && /^\/image\.jpg 200 bytes=\d+-$/.test(server.log[1]), "应该带着Range请求并收到完整的图片");
+      expectImage(state, check, images[4]);
+    });
+
+    await scenario("进度已经完整时不发起请求", () => {
+      server.info.title = "G";
+      setImage(images[5], '"f"');
+      return storeDownload(tab, images[5], chunkSize);
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200"]);
+      expectImage(state, check, images[5]);
+    });
+
+    await scenario("416时清除进度重新下载", () => {
+      server.info.title = "H";
+      setImage(images[6], '"g"');
+      return tab.evaluate(progress => new Promise(resolve => chrome.storage.local.set({wallpaperDownload: Object.assign(progress, {url: location.origin + "/image.jpg"})}, resolve)), {type: "image/jpeg", size: 0, received: images[6].length + chunkSize, chunks: 0, etag: server.etag, lastModified: server.modified}); // 服务器上的图片比进度记录的短
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200", `/image.jpg 416 bytes=${images[6].length + chunkSize}-`, "/image.jpg 200"]);
+      expectImage(state, check, images[6]);
+    });
+
+    await scenario("弱ETag中断", () => {
+      server.info.title = "I";
+      setImage(images[7], 'W/"h"');
+      server.cut = Math.floor(images[7].length / 2);
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200", "/image.jpg 200"]);
+      received = state.download ? state.download.received : 0;
+      check(received > 0 && received < images[7].length, `下载进度不正确：${received}`);
+    });
+    await scenario("弱ETag时用Last-Modified继续", () => {}, download, (state, check) => {
+      expectLog(check, ["/api 200", `/image.jpg 206 bytes=${received}-`]);
+      expectImage(state, check, images[7]);
+    });
+
+    await scenario("压缩传输时不按Content-Length检查", () => {
+      server.info.title = "J";
+      setImage(images[8], '"j"');
+      server.gzip = true;
+    }, download, (state, check) => {
+      expectLog(check, ["/api 200", "/image.jpg 200"]);
+      expectImage(state, check, images[8]);
+    });
+    server.gzip = false;
+  } finally {
+    await browser.close(); // 关闭浏览器
+    listener.close(); // 关闭服务器
+  }
+
+  if (failures.length) { // 有失败的检查
+    console.error("\n" + failures.join("\n")); // 输出失败的检查
+    process.exitCode = 1; // 以非零状态退出
+  }
+}
+
+main().catch(error => {
+  console.error(error); // 输出错误
+  process.exitCode = 1; // 以非零状态退出
+});
@@ -0,0 +1,63 @@
+// IndexedDB数据库的打开和升级，新标签页和后台脚本共用同一个数据库，表结构统一在这里维护
+const databaseName = "newtab"; // 数据库名称
+const databaseVersion = 5; // 数据库版本，表结构变化时需要递增，并在upgradeDatabase中补充升级步骤
+let databasePromise = null; // 打开数据库的Promise，同一个页面只打开一次
+
+// 打开数据库，返回一个Promise，结果为数据库对象
+function openDatabase() {
+  if (!databasePromise) { // 如果还没有打开过数据库
+    databasePromise = new Promise((resolve, reject) => { // 创建打开数据库的Promise
+      let request = indexedDB.open(databaseName, databaseVersion); // 打开数据库
+      request.onupgradeneeded = event => upgradeDatabase(request.result, event.oldVersion); // 版本变化时升级表结构
+      request.onsuccess = () => { // 打开成功
+        let db = request.result; // 获取数据库对象
+        db.onversionchange = () => { // 其他页面要升级数据库时
+          db.close(); // 关闭数据库，避免阻塞升级
+          databasePromise = null; // 下次使用时重新打开
+        };
+        resolve(db); // 返回数据库对象
+      };
+      request.onerror = () => { // 打开失败
+        databasePromise = null; // 下次使用时重新尝试
+        reject(request.error); // 返回错误
+      };
+    });
+  }
+  return databasePromise; // 返回打开数据库的Promise
+}
+
+// 升级数据库的表结构，oldVersion为升级前的版本，0表示新建的数据库
+function upgradeDatabase(db, oldVersion) {
+  if (oldVersion < 1) { // 版本1
+    db.createObjectStore("favicons", {keyPath: "origin"}); // 网站图标缓存，以域名为键
+  }
+  if (oldVersion < 2) { // 版本2
+    db.createObjectStore("visits", {keyPath: "id"}); // 快捷方式的点击统计，以书签id为键
+  }
+  if (oldVersion < 3) { // 版本3
+    db.createObjectStore("wallpapers", {keyPath: "date"}); // 后台脚本下载的每日图片，以图片的日期为键，日期格式为YYYYMMDD
+  }
+  if (oldVersion < 4) { // 版本4
+    db.createObjectStore("wallpaperUses", {keyPath: "date"}); // 每日图片最近一次显示的时间，以图片的日期为键，和图片分开保存，更新时不用重写图片
+  }
+  if (oldVersion < 5) { // 版本5
+    db.createObjectStore("wallpaperChunks", {keyPath: "index"}); // 正在下载的图片已经收到的数据块，以序号为键，同时只有一个下载，下载完成后清空
+  }
+}
+
+// 将一个IndexedDB请求包装为Promise，结果为请求的结果
+function requestPromise(request) {
+  return new Promise((resolve, reject) => { // 创建Promise
+    request.onsuccess = () => resolve(request.result); // 请求成功时返回结果
+    request.onerror = () => reject(request.error); // 请求失败时返回错误
+  });
+}
+
+// 将一个IndexedDB事务包装为Promise，事务提交后完成
+function transactionPromise(transaction) {
+  return new Promise((resolve, reject) => { // 创建Promise
+    transaction.oncomplete = () => resolve(); // 事务提交后完成
+    transaction.onerror = () => reject(transaction.error); // 事务出错时返回错误
+    transaction.onabort = () => reject(transaction.error); // 事务中止时返回错误
+  });
+}
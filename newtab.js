@@ -2,95 +2,1341 @@
 const searchBox = document.getElementById("search-box"); // 获取搜索框容器
 const engineButton = document.getElementById("engine-button"); // 获取搜索引擎切换按钮
 const engineIcon = document.getElementById("engine-icon"); // 获取搜索引擎图标
+const engineMenu = document.getElementById("engine-menu"); // 获取搜索引擎菜单
 const searchInput = document.getElementById("search-input"); // 获取搜索框输入框
+const searchResults = document.getElementById("search-results"); // 获取收藏夹搜索结果列表
 const bookmarkBox = document.getElementById("bookmark-box"); // 获取收藏夹容器
 const folderList = document.getElementById("folder-list"); // 获取文件夹列表
 const shortcutList = document.getElementById("shortcut-list"); // 获取快捷方式列表
 const backgroundButton = document.getElementById("background-button"); // 获取背景切换按钮
-const defaultEngine = "https://www.bing.com"; // 默认搜索引擎
+const sortButton = document.getElementById("sort-button"); // 获取快捷方式排序切换按钮
+const wallpaperNav = document.getElementById("wallpaper-nav"); // 获取翻看历史图片的按钮组
+const wallpaperPrev = document.getElementById("wallpaper-prev"); // 获取前一张图片按钮
+const wallpaperNext = document.getElementById("wallpaper-next"); // 获取后一张图片按钮
+const shortcutTemplate = document.getElementById("shortcut-template"); // 获取快捷方式按钮的模板
+const presetEngines = [ // 内置的搜索引擎，url和suggest中的%s为查询，suggest返回OpenSearch格式的JSON：[查询, [建议...]]
+  {id: "bing", name: "必应", url: "https://www.bing.com/search?q=%s", icon: "", suggest: "https://api.bing.com/osjson.aspx?query=%s"},
+  {id: "google", name: "谷歌", url: "https://www.google.com/search?q=%s", icon: "", suggest: "https://suggestqueries.google.com/complete/search?client=firefox&q=%s"},
+  {id: "baidu", name: "百度", url: "https://www.baidu.com/s?wd=%s", icon: "", suggest: "https://suggestion.baidu.com/su?action=opensearch&ie=utf-8&wd=%s"},
+  {id: "duckduckgo", name: "DuckDuckGo", url: "https://duckduckgo.com/?q=%s", icon: "", suggest: "https://duckduckgo.com/ac/?q=%s&type=list"}
+];
+const defaultEngine = "bing"; // 默认搜索引擎的id
 const defaultIcon = "favicon.ico"; // 默认图标
-const defaultImage = "images/bing-daily.jpg"; // 默认背景图片
-let currentEngine = defaultEngine; // 当前搜索引擎
+let userEngines = []; // 用户添加的搜索引擎，和内置的搜索引擎格式相同，保存在本地存储的engines中
+let currentEngine = compileEngine(presetEngines[0]); // 当前搜索引擎，包含预先拆分好的搜索链接
 let currentFolder = ""; // 当前文件夹
 let currentBackground = 0; // 当前背景，0表示白色，1表示必应每日图片
+let wallpaperRecord = null; // 正在显示的每日图片记录，默认为最新的图片，还没有下载过时为null
+let wallpaperDates = []; // 保存的所有每日图片的日期，从旧到新排列
+let wallpaperPick = ""; // 用户选择的历史图片的日期，为空时显示最新的图片
+let backgroundVariant = null; // 当前使用的每日图片版本，窗口变大时换为更大的版本
+let backgroundImage = ""; // 当前使用的每日图片版本的对象URL，还没有读取或没有下载过时为空
+let backgroundPlaceholder = ""; // 每日图片的占位图，为data URL，原图解码完成前先显示
+let shownWallpaper = ""; // 已经显示或正在解码的每日图片的对象URL
+const wallpaperFade = 400; // 每日图片淡入的时间，单位为毫秒
+let wallpaperState = "idle"; // 每日图片的读取状态，idle表示还没有读取，loading表示正在读取，ready表示已经读取
+const settingKeys = ["bookmarkSnapshot", "engine", "engines", "suggestEndpoint", "background", "wallpaperPick", "folder", "expandedFolders", "sortByVisits"]; // 启动时一次读取的本地存储的键
+const rootFolder = "0"; // 收藏夹根节点的id
+const bookmarkNodes = new Map(); // 收藏夹节点索引，id -> 节点（含父节点id）
+const bookmarkChildren = new Map(); // 文件夹子节点索引，文件夹id -> 子节点id数组
+const loadedFolders = new Set(); // 已经读取过子节点的文件夹id
+let expandedFolders = new Set(); // 文件夹树中展开的文件夹id
+let pendingRender = {scheduled: false, folders: false, shortcuts: false, removed: false}; // 收藏夹变化后待刷新的界面区域，removed表示当前文件夹被删除
+let bookmarksReady = false; // 收藏夹索引是否已经建立
+let shownFolders = {key: "", items: []}; // 当前显示的文件夹列表，items为[id, 标题, 层级, 展开状态]数组，key为其序列化结果
+let shownShortcuts = {key: "", items: []}; // 当前显示的快捷方式列表，items为[id, 标题, 链接]数组
+let savedSnapshot = ""; // 上次保存的快照的序列化结果，用于避免重复写入
+const virtualThreshold = 200; // 快捷方式超过这个数量时，只渲染可见的行
+const overscanRows = 2; // 可见区域上下额外渲染的行数，避免快速滚动时出现空白
+let shortcutSize = 100; // 快捷方式按钮加上外边距后占用的宽度和高度，渲染后会重新测量
+let shortcutWindow = {virtual: false, start: 0, end: 0, columns: 0}; // 虚拟列表当前渲染的快捷方式范围
+let shortcutButtons = new Map(); // 当前渲染的快捷方式按钮，id -> 按钮
+const faviconTTL = 7 * 24 * 3600 * 1000; // 图标缓存的有效期，7天
+const faviconMissTTL = 24 * 3600 * 1000; // 图标获取失败的缓存有效期，1天内不再重试
+const faviconBudget = 5 * 1024 * 1024; // 图标缓存的总大小上限，5MB
+const faviconConcurrency = 4; // 同时获取图标的请求数量上限
+const faviconTouchInterval = 3600 * 1000; // 图标使用时间的更新间隔，1小时内重复使用不再写入
+let faviconStore = "loading"; // 图标缓存的状态，loading表示正在读取，ready表示可用，unavailable表示不可用
+const faviconRecords = new Map(); // 缓存的图标记录，域名 -> {origin, blob, size, fetchedAt, usedAt}
+const faviconUrls = new Map(); // 已经显示过的图标的对象URL，第一次显示时才创建，域名 -> 对象URL，获取失败的域名对应空字符串
+let faviconBytes = 0; // 缓存的图标的总大小
+const faviconQueue = new Map(); // 等待获取图标的网站，域名 -> 页面链接
+const faviconFetching = new Set(); // 正在获取图标的网站
+const faviconTouched = new Set(); // 使用时间还没有写入数据库的网站
+let faviconFlushTimer = 0; // 批量写入使用时间的定时器
+let defaultFavicon = null; // 浏览器图标库的默认图标，用于判断本地是否有某个页面的图标
+const folderScroll = new Map(); // 每个文件夹的滚动位置，切换回来时恢复
+let searchWorker = null; // 建立和查询搜索索引的搜索线程，第一次使用搜索框时创建
+let searchIndexState = "idle"; // 搜索索引的状态，idle表示还没有建立，loading表示正在读取收藏夹，ready表示已经交给搜索线程，可以查询
+const searchEntries = new Map(); // 搜索索引中的书签，id -> {id, title, url}，搜索线程只返回id，由这里取出标题和链接
+let pendingSearchUpdates = []; // 读取收藏夹期间发生的变化，读取后再更新
+let searchMatches = {query: "", items: []}; // 搜索线程返回的最近一次查询的结果，新的结果返回前继续显示，避免列表闪烁
+let searchedQuery = ""; // 最近一次发给搜索线程的查询
+let shownResults = {key: "", items: [], selected: -1}; // 当前显示的搜索结果，items为书签和搜索建议{suggestion}的数组，selected为选中的序号
+const suggestDelay = 150; // 停止输入多久后才请求搜索建议，单位为毫秒
+const suggestLimit = 5; // 显示的搜索建议数量上限
+const suggestCacheSize = 100; // 缓存的搜索建议的查询数量上限，超过后淘汰最久没用的
+let suggestEndpoint = ""; // 本地存储中设置的搜索建议接口，为空时使用当前搜索引擎的接口，可以指向本地的测试服务器
+const suggestCache = new Map(); // 搜索建议缓存，请求链接 -> 建议数组，Map按插入顺序排列，最近用过的放在最后
+let suggestTimer = 0; // 延迟请求搜索建议的定时器
+let suggestRequest = {url: "", controller: null}; // 等待中或进行中的搜索建议请求
+const warmupDelay = 100; // 鼠标在快捷方式上停留多久才预先连接，避免划过时也连接，单位为毫秒
+const warmupBudget = 6; // 每个页面最多预先连接的快捷方式域名数量，避免建立过多连接
+const warmedOrigins = new Set(); // 已经提示浏览器预先连接的域名
+const warmedShortcuts = new Set(); // 已经预先连接的快捷方式域名
+let warmupTimer = 0; // 延迟预先连接快捷方式的定时器
+const visitHalfLife = 14 * 24 * 3600 * 1000; // 点击次数的半衰期，14天前的一次点击只算半次
+let sortByVisits = false; // 是否按使用频率排列快捷方式
+const visitRecords = new Map(); // 快捷方式的点击统计，id -> {id, count, usedAt, rank}
+const visitTouched = new Set(); // 点击统计还没有写入数据库的快捷方式
+let visitFlushTimer = 0; // 批量写入点击统计的定时器
 
-// 从后台脚本获取搜索引擎，并设置图标和链接
-function getEngine() {
-  chrome.runtime.sendMessage({action: "getEngine"}, response => { // 向后台脚本发送获取搜索引擎的消息
-    let engine = response.engine; // 获取后台脚本返回的搜索引擎
-    currentEngine = engine; // 设置当前搜索引擎
-    engineIcon.src = engine + "/favicon.ico"; // 设置搜索引擎图标
-    searchBox.action = engine + "/search"; // 设置搜索框的链接
-  });
-}
-
-// 从本地存储获取背景，并设置背景
-function getBackground() {
-  chrome.storage.local.get("background", data => { // 从本地存储中获取背景
-    let background = data.background || 0; // 如果没有设置过，就使用默认背景
-    currentBackground = background; // 设置当前背景
-    if (background === 0) { // 如果是白色背景
-      document.body.style.background = "white"; // 设置背景颜色为白色
-    } else if (background === 1) { // 如果是必应每日图片背景
-      chrome.storage.local.get("bingDaily", data => { // 从本地存储中获取必应每日图片
-        let bingDaily = data.bingDaily || defaultImage; // 如果没有缓存过，就使用默认图片
-        document.body.style.background = `url(${bingDaily}) no-repeat center center fixed`; // 设置背景图片为必应每日图片
-        document.body.style.backgroundSize = "cover"; // 设置背景图片的大小为覆盖整个网页
-      });
-    }
+// 启动新标签页：一次读取所有设置，同时读取收藏夹的顶层文件夹，每个区域的数据到了就先显示，不等待图片加载
+function startup() {
+  let settings = new Promise(resolve => chrome.storage.local.get(settingKeys, resolve)); // 从本地存储中一次读取所有设置
+  let root = new Promise(resolve => loadFolder(rootFolder, resolve)); // 同时读取收藏夹根节点下的顶层文件夹
+  showSnapshot(); // 接管快照脚本已经画出的界面
+  settings.then(data => { // 设置读取后
+    if (data.bookmarkSnapshot) chrome.storage.local.remove("bookmarkSnapshot"); // 删除旧版本保存在本地存储中的快照
+    getEngine(data); // 设置搜索引擎
+    getBackground(data); // 设置背景
+    expandedFolders = new Set(data.expandedFolders || []); // 恢复文件夹的展开状态
+    setSortByVisits(!!data.sortByVisits); // 恢复排序方式
   });
+  Promise.all([settings, root]).then(([data]) => getBookmarks(data.folder)); // 设置和顶层文件夹都读取后生成实时的收藏夹
+  loadFavicons(); // 读取缓存的图标
+  loadVisits(); // 读取快捷方式的点击统计
+  chrome.runtime.sendMessage({action: "getImage"}).catch(() => {}); // 让后台脚本检查必应每日图片，后台脚本不存在时忽略
 }
 
-// 从浏览器获取收藏夹，并生成文件夹和快捷方式
-function getBookmarks() {
-  chrome.bookmarks.getTree(tree => { // 从浏览器获取收藏夹的树形结构
-    let root = tree[0]; // 获取收藏夹的根节点
-    let folders = getAllFolders(root); // 获取所有文件夹节点，包括次级文件夹
-    for (let folder of folders) { // 遍历每个文件夹
-      let folderButton = document.createElement("button"); // 创建一个文件夹按钮
-      folderButton.className = "folder-button"; // 设置文件夹按钮的类名
-      folderButton.innerText = folder.title; // 设置文件夹按钮的文本为文件夹的标题
-      folderButton.onclick = function() { // 设置文件夹按钮的点击事件
-        currentFolder = folder.id; // 设置当前文件夹为该文件夹的id
-        chrome.storage.local.set({folder: currentFolder}); // 将当前文件夹保存到本地存储
-        showShortcuts(folder); // 显示该文件夹的快捷方式
-      };
-      folderList.appendChild(folderButton); // 将文件夹按钮添加到文件夹列表中
+// 根据本地存储中搜索引擎的设置，设置图标和链接
+function getEngine(data) {
+  userEngines = Array.isArray(data.engines) ? data.engines : []; // 没有添加过时为空
+  suggestEndpoint = data.suggestEndpoint || ""; // 没有设置时使用搜索引擎的接口
+  let id = data.engine || defaultEngine; // 如果没有设置过，就使用默认搜索引擎
+  if (!id.startsWith("user-") && !getEngines().some(engine => engine.id === id)) id = migrateEngine(id); // 旧版本保存的是用户输入的官网链接，可能没有协议，转换为搜索引擎的id
+  setEngine(id); // 设置搜索引擎
+}
+
+// 将旧版本保存的搜索引擎官网链接转换为搜索引擎，和内置的搜索引擎同域名时使用内置的，否则按旧版本的规则添加为用户的搜索引擎，
+// 不是网页链接时使用默认搜索引擎，转换出错时也不影响其他设置的恢复
+function migrateEngine(url) {
+  let id = defaultEngine; // 无法转换时使用默认搜索引擎
+  try {
+    let site = normalizeSiteUrl(url); // 补全协议后的官网链接
+    if (site) { // 如果是网页链接
+      let origin = getDomain(site); // 搜索引擎的域名
+      let preset = presetEngines.find(engine => getDomain(engine.url) === origin); // 查找同域名的内置搜索引擎
+      id = preset ? preset.id : addUserEngine(origin + "/search?q=%s"); // 旧版本的搜索链接都是官网链接加上/search
     }
-    chrome.storage.local.get("folder", data => { // 从本地存储中获取上次展示的文件夹
-      let folder = data.folder || root.id; // 如果没有记录过，就使用根节点
+  } catch (error) { // 如果链接无效
+    id = defaultEngine; // 使用默认搜索引擎
+  }
+  chrome.storage.local.set({engine: id}); // 保存转换后的搜索引擎
+  return id;
+}
+
+// 补全用户输入的链接，没有协议时按https处理，不是http或https链接时返回空字符串
+function normalizeSiteUrl(value) {
+  let url = /^[a-z][\w+.-]*:\/\//i.test(value) ? value : "https://" + value; // 没有协议时加上https，相对链接会被解析到扩展的页面
+  try {
+    return /^https?:$/.test(new URL(url).protocol) ? url : ""; // 只接受网页链接
+  } catch (error) { // 如果链接无效
+    return "";
+  }
+}
+
+// 拆分搜索引擎的搜索链接，切换时拆分一次，搜索时只需要拼接查询
+function compileEngine(engine) {
+  return {
+    id: engine.id, // 搜索引擎的id
+    name: engine.name, // 搜索引擎的名称
+    icon: engine.icon || getDomain(engine.url) + "/favicon.ico", // 没有设置图标时使用网站的图标
+    suggest: engine.suggest || "", // 搜索建议接口，为空时不显示搜索建议
+    parts: engine.url.split("%s") // 搜索链接按查询的位置拆分
+  };
+}
+
+// 获取所有搜索引擎，内置的在前，用户添加的在后
+function getEngines() {
+  return presetEngines.concat(userEngines);
+}
+
+// 设置当前搜索引擎，找不到时使用默认搜索引擎
+function setEngine(id) {
+  let engines = getEngines(); // 所有搜索引擎
+  let engine = engines.find(item => item.id === id) || engines.find(item => item.id === defaultEngine); // 查找搜索引擎
+  currentEngine = compileEngine(engine); // 设置当前搜索引擎
+  if (engineIcon.getAttribute("src") !== currentEngine.icon) engineIcon.src = currentEngine.icon; // 设置搜索引擎图标
+  engineButton.title = currentEngine.name; // 设置搜索引擎名称为提示
+  if (!engineMenu.hidden) renderEngineMenu(); // 更新打开的菜单
+}
+
+// 获取搜索的链接
+function getSearchUrl(query) {
+  return currentEngine.parts.join(encodeURIComponent(query)); // 在拆分的位置填入查询
+}
+
+// 切换搜索引擎并保存到本地存储
+function selectEngine(id) {
+  setEngine(id); // 设置当前搜索引擎
+  chrome.storage.local.set({engine: currentEngine.id}); // 保存当前搜索引擎
+}
+
+// 添加一个用户的搜索引擎并保存到本地存储，url为搜索链接，返回搜索引擎的id
+function addUserEngine(url) {
+  let id = "user-" + Date.now(); // 用添加的时间生成id
+  userEngines = userEngines.concat({id: id, name: new URL(url).hostname, url: url, icon: "", suggest: ""}); // 以网站的域名作为名称
+  chrome.storage.local.set({engines: userEngines}); // 保存用户添加的搜索引擎
+  return id;
+}
+
+// 删除一个用户的搜索引擎，删除的是当前搜索引擎时切换到默认搜索引擎
+function removeUserEngine(id) {
+  userEngines = userEngines.filter(engine => engine.id !== id); // 删除该搜索引擎
+  chrome.storage.local.set({engines: userEngines}); // 保存用户添加的搜索引擎
+  if (currentEngine.id === id) selectEngine(defaultEngine); // 切换到默认搜索引擎
+  else renderEngineMenu(); // 更新菜单
+}
+
+// 生成搜索引擎菜单，当前搜索引擎为选中状态
+function renderEngineMenu() {
+  let fragment = document.createDocumentFragment(); // 创建文档片段
+  for (let engine of getEngines()) { // 遍历所有搜索引擎
+    let item = document.createElement("li"); // 创建菜单项
+    let icon = document.createElement("img"); // 创建搜索引擎图标
+    let name = document.createElement("span"); // 创建搜索引擎名称
+    item.className = "engine-item"; // 设置菜单项的类名
+    item.setAttribute("role", "menuitemradio"); // 设置为单选的菜单项
+    item.setAttribute("aria-checked", engine.id === currentEngine.id); // 标记当前搜索引擎
+    item.tabIndex = -1; // 可以用方向键聚焦
+    item.dataset.id = engine.id; // 记录搜索引擎的id，点击事件由菜单统一处理
+    icon.src = compileEngine(engine).icon; // 设置搜索引擎图标
+    icon.alt = ""; // 图标只是装饰
+    name.textContent = engine.name; // 设置搜索引擎名称
+    item.append(icon, name); // 组合菜单项
+    if (engine.id.startsWith("user-")) { // 如果是用户添加的搜索引擎
+      let remove = document.createElement("button"); // 创建删除按钮
+      remove.className = "engine-remove"; // 设置删除按钮的类名
+      remove.type = "button"; // 设置类型为按钮，以防止提交表单
+      remove.tabIndex = -1; // 不单独聚焦
+      remove.textContent = "×"; // 设置删除按钮的文字
+      remove.setAttribute("aria-label", "删除" + engine.name); // 设置删除按钮的名称
+      item.append(remove); // 放入菜单项
+    }
+    fragment.appendChild(item); // 放入文档片段
+  }
+  let add = document.createElement("li"); // 创建添加搜索引擎的菜单项
+  add.className = "engine-item engine-add"; // 设置菜单项的类名
+  add.setAttribute("role", "menuitem"); // 设置为菜单项
+  add.tabIndex = -1; // 可以用方向键聚焦
+  add.textContent = "添加搜索引擎"; // 设置菜单项的文字
+  fragment.appendChild(add); // 放入文档片段
+  engineMenu.replaceChildren(fragment); // 替换菜单的内容
+}
+
+// 打开或关闭搜索引擎菜单，打开时聚焦当前搜索引擎
+function toggleEngineMenu(open) {
+  if (open === !engineMenu.hidden) return; // 如果状态没有变化，就不处理
+  engineMenu.hidden = !open; // 显示或隐藏菜单
+  engineButton.setAttribute("aria-expanded", open); // 同步按钮的展开状态
+  if (!open) return;
+  renderEngineMenu(); // 生成菜单
+  engineMenu.querySelector('[aria-checked="true"]').focus(); // 聚焦当前搜索引擎
+}
+
+// 添加用户的搜索引擎，输入的链接中没有%s时按官网链接处理
+function promptUserEngine() {
+  let url = prompt("请输入搜索引擎的搜索链接，用%s代替搜索内容，例如：https://www.google.com/search?q=%s"); // 弹出一个输入框，提示用户输入搜索链接
+  if (!url) return; // 如果用户取消了
+  url = normalizeSiteUrl(url.trim()); // 补全协议
+  if (!url) { // 如果不是网页链接
+    alert("搜索链接无效"); // 提示用户
+    return;
+  }
+  if (!url.includes("%s")) url = getDomain(url) + "/search?q=%s"; // 兼容旧版本的官网链接
+  try {
+    selectEngine(addUserEngine(url)); // 添加并切换到该搜索引擎
+  } catch (error) { // 如果链接无效
+    alert("搜索链接无效"); // 提示用户
+  }
+}
+
+// 根据本地存储中背景的设置，设置背景
+function getBackground(data) {
+  currentBackground = data.background || 0; // 如果没有设置过，就使用默认背景
+  wallpaperPick = data.wallpaperPick || ""; // 如果没有选择过，就显示最新的图片
+  showBackground(); // 设置背景
+}
+
+// 按当前背景设置网页的背景，每日图片先显示占位图，原图解码完成后再淡入，每日图片还没有读取时先读取，读取后再显示
+function showBackground() {
+  showWallpaperNav(); // 更新翻看历史图片的按钮
+  if (currentBackground !== 1) { // 如果是白色背景
+    document.body.style.background = "white"; // 设置背景颜色为白色
+    showWallpaper(""); // 移除每日图片
+    return;
+  }
+  if (wallpaperState === "idle") loadWallpaper(); // 读取后台脚本下载的每日图片
+  if (wallpaperState !== "ready") return; // 读取期间保留快照脚本画出的占位图
+  if (backgroundPlaceholder) { // 如果有占位图
+    document.body.style.background = `url(${backgroundPlaceholder}) no-repeat center center fixed`; // 设置背景图片为占位图，缩小的图片放大后是模糊的
+    document.body.style.backgroundSize = "cover"; // 设置背景图片的大小为覆盖整个网页
+  } else { // 如果还没有每日图片，或者图片没有占位图
+    document.body.style.background = "white"; // 设置背景颜色为白色
+  }
+  showWallpaperVariant(); // 解码后淡入原图
+}
+
+// 选择能覆盖窗口的最小的图片版本，图片按cover铺满窗口，所以需要的宽度由窗口宽度和按图片比例换算的窗口高度中较大的决定，省流量模式下不乘设备像素比，并选择不超过需要的宽度的最大版本
+function pickWallpaperVariant(record) {
+  if (!record.variants) return {blob: record.blob}; // 旧版本保存的图片只有原图
+  let variants = record.variants.concat({width: record.width, height: record.height, blob: record.blob}); // 所有版本，按宽度从小到大排列，最后是原图
+  let saveData = navigator.connection && navigator.connection.saveData; // 是否开启了省流量模式
+  let needed = Math.max(innerWidth, innerHeight * record.width / record.height) * (saveData ? 1 : devicePixelRatio); // 需要的图片宽度，单位为设备像素
+  if (saveData) return variants.filter(variant => variant.width <= needed).pop() || variants[0]; // 省流量模式下选择更小的版本
+  return variants.find(variant => variant.width >= needed) || variants[variants.length - 1]; // 选择能覆盖窗口的最小版本，都不够大时使用原图
+}
+
+// 按窗口大小选择每日图片的版本并显示，窗口变大时换为更大的版本，变小时继续使用当前的版本
+function showWallpaperVariant() {
+  if (!wallpaperRecord) return showWallpaper(""); // 还没有下载过每日图片
+  let variant = pickWallpaperVariant(wallpaperRecord); // 选择图片版本
+  if (!backgroundVariant || variant.width > backgroundVariant.width) { // 如果还没有选择过，或者需要更大的版本
+    if (backgroundImage) URL.revokeObjectURL(backgroundImage); // 释放之前的版本，已经显示的图片不受影响
+    backgroundVariant = variant; // 记录使用的版本
+    backgroundImage = URL.createObjectURL(variant.blob); // 为图片创建对象URL
+  }
+  showWallpaper(backgroundImage); // 解码后淡入
+}
+
+// 显示每日图片的原图，原图先在图片解码线程中解码，解码完成后再插入页面并淡入，不阻塞输入，淡入完成后移除之前的图片
+function showWallpaper(url) {
+  if (url === shownWallpaper) return; // 已经显示或正在解码
+  shownWallpaper = url; // 记录要显示的图片
+  if (!url) { // 如果不显示每日图片
+    document.querySelectorAll(".wallpaper").forEach(image => image.remove()); // 移除所有图片
+    return;
+  }
+  let image = document.createElement("img"); // 创建图片元素
+  image.className = "wallpaper"; // 设置图片的类名
+  image.alt = ""; // 图片只是背景
+  image.src = url; // 设置图片的链接
+  image.decode().then(() => { // 解码完成后
+    if (shownWallpaper !== url) return; // 解码期间切换了背景或换了新的图片
+    let previous = document.querySelectorAll(".wallpaper"); // 之前的图片
+    document.body.prepend(image); // 插入页面，显示在之前的图片上面
+    image.animate([{opacity: 0}, {opacity: 1}], {duration: wallpaperFade, easing: "ease-out"}).finished.then(() => { // 淡入
+      previous.forEach(item => item.remove()); // 淡入完成后移除之前的图片
+    });
+  }).catch(() => {}); // 图片损坏时继续显示占位图
+}
+
+// 显示或隐藏翻看历史图片的按钮，只在显示每日图片并且保存了多张图片时显示，按钮的提示为图片的标题和版权信息
+function showWallpaperNav() {
+  let index = wallpaperRecord ? wallpaperDates.indexOf(wallpaperRecord.date) : -1; // 正在显示的图片的位置
+  wallpaperNav.hidden = currentBackground !== 1 || index < 0 || wallpaperDates.length < 2; // 没有可以翻看的图片时隐藏
+  if (wallpaperNav.hidden) return;
+  wallpaperPrev.disabled = index === 0; // 已经是最早的图片
+  wallpaperNext.disabled = index === wallpaperDates.length - 1; // 已经是最新的图片
+  wallpaperNav.title = [wallpaperRecord.title, wallpaperRecord.copyright].filter(Boolean).join("\n"); // 图片的标题和版权信息
+}
+
+// 切换到前一张或后一张历史图片，offset为-1或1，切换到最新的图片时恢复为显示最新的图片，选择保存到本地存储，其他新标签页同步显示
+function stepWallpaper(offset) {
+  let date = wallpaperDates[wallpaperDates.indexOf(wallpaperRecord.date) + offset]; // 要显示的图片的日期
+  if (!date) return; // 已经是第一张或最后一张
+  setWallpaperPick(date === wallpaperDates[wallpaperDates.length - 1] ? "" : date); // 选择图片
+  chrome.storage.local.set({wallpaperPick: wallpaperPick}); // 保存选择的图片，为空时表示显示最新的图片
+}
+
+// 设置要显示的图片并重新读取，date为空时显示最新的图片
+function setWallpaperPick(date) {
+  wallpaperPick = date; // 记录选择的图片
+  wallpaperState = "idle"; // 下次显示时重新读取
+  showBackground(); // 正在显示每日图片时读取选择的图片
+}
+
+// 从IndexedDB读取后台脚本下载的每日图片，有选择的历史图片时读取该图片，否则读取最新的图片，不发起网络请求
+function loadWallpaper() {
+  wallpaperState = "loading"; // 标记正在读取
+  openDatabase().then(db => { // 打开数据库
+    return requestPromise(db.transaction("wallpapers").objectStore("wallpapers").getAllKeys()).then(dates => { // 读取所有图片的日期，不读取图片
+      wallpaperDates = dates; // 按日期从旧到新排列
+      let date = dates.includes(wallpaperPick) ? wallpaperPick : dates[dates.length - 1]; // 选择的图片已经被清理时显示最新的图片
+      return date && requestPromise(db.transaction("wallpapers").objectStore("wallpapers").get(date)); // 读取图片，还没有下载过时为undefined
+    });
+  }).then(record => {
+    wallpaperRecord = record || null; // 记录要显示的图片，还没有下载过时为null
+    backgroundVariant = null; // 显示时重新选择图片版本
+    backgroundPlaceholder = wallpaperRecord && wallpaperRecord.placeholder || ""; // 图片的占位图
+    if (wallpaperRecord) touchWallpaper(wallpaperRecord.date); // 记录显示的时间
+  }).catch(() => {}).then(() => { // 如果浏览器不支持或数据库出错，就显示白色背景
+    wallpaperState = "ready"; // 标记已经读取
+    showBackground(); // 显示图片
+    saveSnapshot(); // 保存新的背景
+  });
+}
+
+// 记录图片最近一次显示的时间，后台脚本清理空间时先清理最久没有显示的图片
+function touchWallpaper(date) {
+  openDatabase().then(db => { // 打开数据库
+    let transaction = db.transaction("wallpaperUses", "readwrite"); // 创建读写事务
+    transaction.objectStore("wallpaperUses").put({date: date, usedAt: Date.now()}); // 保存显示的时间
+    return transactionPromise(transaction); // 等待事务提交
+  }).catch(() => {}); // 写入失败时只影响清理的顺序
+}
+
+// 顶层文件夹读取后，读取其他可见的文件夹，建立索引后生成文件夹和快捷方式，savedFolder为上次展示的文件夹
+function getBookmarks(savedFolder) {
+  watchBookmarks(); // 监听收藏夹的变化，增量更新索引
+  loadVisibleFolders(() => { // 读取所有展开的文件夹的子节点
+    bookmarksReady = true; // 标记收藏夹索引已经建立
+    showFolders(); // 生成文件夹按钮，和快照相同时不会重绘
+    let folder = currentFolder || savedFolder; // 优先使用快照中或用户刚刚选择的文件夹
+    ensureFolder(folder, loaded => { // 读取该文件夹的子节点
+      if (!loaded) { // 如果没有记录过，或者该文件夹已被删除
+        let folders = getVisibleFolders(); // 获取可见的文件夹
+        folder = folders.length ? folders[0][0] : rootFolder; // 就使用第一个文件夹
+      }
       currentFolder = folder; // 设置当前文件夹为该文件夹
-      showShortcuts(folders.find(f => f.id === folder)); // 显示该文件夹的快捷方式
+      ensureFolder(folder, () => { // 确保该文件夹的子节点已经读取
+        showFolders(); // 读取后可能发现该文件夹没有子文件夹，需要刷新展开按钮
+        showShortcuts(folder); // 显示该文件夹的快捷方式，和快照相同时不会重绘
+        saveSnapshot(); // 保存最新的快照
+      });
     });
   });
 }
 
-// 获取一个节点下的所有文件夹节点，包括次级文件夹
-function getAllFolders(node) {
-  let folders = []; // 创建一个空数组，用于存储文件夹节点
-  if (node.children) { // 如果该节点有子节点
-    for (let child of node.children) { // 遍历每个子节点
-      if (child.children) { // 如果该子节点是文件夹节点
-        folders.push(child); // 将该子节点添加到文件夹数组中
-        folders = folders.concat(getAllFolders(child)); // 将该子节点下的所有文件夹节点也添加到文件夹数组中
+// 读取一个文件夹的直接子节点并加入索引，callback的参数表示是否读取成功
+function loadFolder(id, callback) {
+  chrome.bookmarks.getChildren(id, children => { // 从浏览器获取该文件夹的子节点
+    if (chrome.runtime.lastError || !children) { // 如果该文件夹不存在
+      callback(false); // 读取失败
+      return;
+    }
+    for (let child of children) addBookmarkNode(child); // 将子节点加入索引
+    bookmarkChildren.set(id, children.map(child => child.id)); // 记录该文件夹的子节点id
+    loadedFolders.add(id); // 标记该文件夹的子节点已经读取
+    callback(true); // 读取成功
+  });
+}
+
+// 确保一个文件夹的子节点已经读取，已经读取过时直接回调
+function ensureFolder(id, callback) {
+  if (loadedFolders.has(id)) { // 如果已经读取过
+    callback(true); // 直接回调
+  } else if (id) { // 如果还没有读取过
+    loadFolder(id, callback); // 读取该文件夹的子节点
+  } else { // 如果没有指定文件夹
+    callback(false); // 读取失败
+  }
+}
+
+// 读取所有可见且展开、但还没有读取子节点的文件夹，逐层读取直到全部读取完毕
+function loadVisibleFolders(callback) {
+  let pending = getVisibleFolders().filter(([id]) => expandedFolders.has(id) && !loadedFolders.has(id)); // 需要读取的文件夹
+  if (!pending.length) { // 如果没有需要读取的文件夹
+    callback(); // 读取完毕
+    return;
+  }
+  let remaining = pending.length; // 还没有返回的读取请求数量
+  for (let [id] of pending) { // 同一层的文件夹并行读取
+    loadFolder(id, () => { // 读取该文件夹的子节点
+      if (--remaining === 0) loadVisibleFolders(callback); // 这一层读取完毕后，继续读取下一层
+    });
+  }
+}
+
+// 展开或收起一个文件夹，展开时才读取它的子节点，并保存展开状态
+function toggleFolder(id, expand) {
+  if (expand === expandedFolders.has(id)) return; // 如果已经是目标状态，就不处理
+  if (expand) { // 如果要展开
+    expandedFolders.add(id); // 记录该文件夹已展开
+  } else { // 如果要收起
+    expandedFolders.delete(id); // 记录该文件夹已收起
+  }
+  chrome.storage.local.set({expandedFolders: [...expandedFolders]}); // 将展开状态保存到本地存储
+  loadVisibleFolders(() => { // 读取新出现的展开文件夹的子节点
+    showFolders(); // 刷新文件夹列表
+    saveSnapshot(); // 保存最新的快照
+  });
+}
+
+// 接管快照脚本画出的界面，记录已经显示的内容，并复用已经画出的快捷方式按钮，实时数据和快照相同时不会重绘
+function showSnapshot() {
+  let snapshot = paintedSnapshot; // 快照脚本画出的快照
+  if (!snapshot) return; // 如果没有画出，就等待实时数据
+  savedSnapshot = serializeSnapshot(snapshot.folder, snapshot.folders, snapshot.shortcuts, snapshot.background); // 记录已保存的快照
+  currentFolder = snapshot.folder; // 设置当前文件夹为快照中的文件夹
+  shownFolders = {key: JSON.stringify(snapshot.folders), items: snapshot.folders}; // 文件夹按钮已经画出，不需要重新生成
+  for (let button of shortcutList.querySelectorAll(".shortcut-button")) shortcutButtons.set(button.dataset.id, button); // 接管已经画出的快捷方式按钮
+  renderShortcuts(snapshot.shortcuts); // 按id协调时会原样保留这些按钮，只补上图标
+}
+
+// 序列化快照中的数据部分，用于判断快照是否变化
+function serializeSnapshot(folder, folders, shortcuts, background) {
+  return JSON.stringify([folder, folders, shortcuts, background]); // 当前文件夹、文件夹列表、快捷方式列表和背景
+}
+
+// 获取快捷方式列表的HTML，去掉图标的链接和样式，对象URL在新的页面中无效，由网页脚本重新设置
+function getShortcutHtml() {
+  let list = shortcutList.cloneNode(true); // 复制快捷方式列表，不改动显示中的元素
+  for (let icon of list.querySelectorAll("img")) { // 遍历每个图标
+    icon.removeAttribute("src"); // 去掉图标的链接
+    icon.removeAttribute("style"); // 去掉加载失败时隐藏图标的样式
+  }
+  return list.innerHTML; // 返回HTML
+}
+
+// 将当前显示的文件夹、快捷方式和背景保存为快照，同时保存画好的HTML，下次打开时由快照脚本同步画出，内容没有变化时不写入
+function saveSnapshot() {
+  if (!bookmarksReady) return; // 实时数据到达之前不保存
+  let background = document.body.style.cssText; // 背景的样式，每日图片只保存占位图
+  let serialized = serializeSnapshot(currentFolder, shownFolders.items, shownShortcuts.items, background); // 序列化快照
+  if (serialized === savedSnapshot) return; // 如果和上次保存的相同，就不写入
+  savedSnapshot = serialized; // 记录已保存的快照
+  let snapshot = { // 快照内容
+    version: snapshotVersion, // 快照格式版本
+    folder: currentFolder, // 当前文件夹
+    folders: shownFolders.items, // 文件夹列表
+    shortcuts: shownShortcuts.items, // 当前文件夹的快捷方式列表
+    background: background, // 背景的样式
+    folderHtml: folderList.innerHTML, // 文件夹列表的HTML
+    shortcutHtml: shortcutWindow.virtual ? "" : getShortcutHtml() // 快捷方式列表的HTML，虚拟列表只渲染了可见的行，由网页脚本渲染
+  };
+  try {
+    localStorage.setItem(snapshotKey, JSON.stringify(snapshot)); // 同步保存到localStorage
+  } catch (error) { // 如果超出了localStorage的容量
+    localStorage.removeItem(snapshotKey); // 删除旧的快照，避免画出过时的界面
+  }
+}
+
+// 切换到指定的文件夹，再次点击当前文件夹时什么也不做
+function selectFolder(folderId) {
+  if (folderId === currentFolder && shownShortcuts.folder === folderId && bookmarksReady) return; // 如果已经显示了该文件夹，就不处理
+  currentFolder = folderId; // 设置当前文件夹为该文件夹的id
+  chrome.storage.local.set({folder: currentFolder}); // 将当前文件夹保存到本地存储
+  if (!bookmarksReady) return; // 如果收藏夹索引还没有建立，等建立后再显示
+  showFolder(folderId); // 显示该文件夹的快捷方式
+}
+
+// 显示指定文件夹的快捷方式，该文件夹的子节点还没有读取时先读取
+function showFolder(folderId) {
+  ensureFolder(folderId, loaded => { // 读取该文件夹的子节点
+    if (!loaded || folderId !== currentFolder) return; // 如果读取失败，或者读取期间又切换了文件夹，就不显示
+    showFolders(); // 读取后可能发现该文件夹没有子文件夹，需要刷新展开按钮
+    showShortcuts(folderId); // 显示该文件夹的快捷方式
+    saveSnapshot(); // 保存最新的快照
+  });
+}
+
+// 为一个节点及其所有子节点建立索引，使用显式栈遍历，避免递归和数组拷贝
+function indexBookmarks(root) {
+  let stack = [root]; // 待处理的节点栈
+  while (stack.length) { // 当栈中还有节点时
+    let node = stack.pop(); // 取出一个节点
+    addBookmarkNode(node); // 将该节点加入索引
+    if (node.children) { // 如果该节点是文件夹节点
+      bookmarkChildren.set(node.id, node.children.map(child => child.id)); // 记录该文件夹的子节点id
+      loadedFolders.add(node.id); // 标记该文件夹的子节点已经读取
+      for (let i = node.children.length - 1; i >= 0; i--) { // 倒序压栈，保持遍历顺序
+        stack.push(node.children[i]); // 将子节点压入栈中
       }
     }
   }
-  return folders; // 返回文件夹数组
 }
 
-// 显示指定文件夹的快捷方式
-function showShortcuts(folder) {
-  shortcutList.innerHTML = ""; // 清空快捷方式列表的内容
-  let shortcuts = folder.children.filter(node => !node.children); // 筛选出快捷方式节点
+// 将一个节点加入索引，只保存需要用到的字段，不保留原始的子树
+function addBookmarkNode(node) {
+  bookmarkNodes.set(node.id, { // 以id为键保存节点
+    id: node.id, // 节点id
+    parentId: node.parentId, // 父节点id
+    title: node.title, // 节点标题
+    url: node.url // 节点链接，文件夹节点没有链接
+  });
+  if (!node.url && !bookmarkChildren.has(node.id)) { // 如果是文件夹节点且还没有子节点数组
+    bookmarkChildren.set(node.id, []); // 创建一个空的子节点数组，子节点在读取后才会填入
+  }
+}
+
+// 从索引中删除一个节点及其所有子节点
+function removeBookmarkNode(id) {
+  let stack = [id]; // 待删除的节点栈
+  while (stack.length) { // 当栈中还有节点时
+    let nodeId = stack.pop(); // 取出一个节点id
+    let children = bookmarkChildren.get(nodeId); // 获取该节点的子节点
+    if (children) { // 如果该节点是文件夹节点
+      stack.push(...children); // 将子节点压入栈中
+      bookmarkChildren.delete(nodeId); // 删除该文件夹的子节点数组
+      loadedFolders.delete(nodeId); // 删除该文件夹的读取标记
+    }
+    if (nodeId === currentFolder) pendingRender.removed = true; // 当前文件夹被删除，刷新时改为展示第一个文件夹
+    bookmarkNodes.delete(nodeId); // 删除该节点
+  }
+}
+
+// 从父节点的子节点数组中移除一个节点
+function detachBookmarkNode(parentId, id) {
+  let siblings = bookmarkChildren.get(parentId); // 获取父节点的子节点数组
+  if (siblings) { // 如果父节点在索引中
+    let index = siblings.indexOf(id); // 查找该节点的位置
+    if (index !== -1) siblings.splice(index, 1); // 从数组中移除该节点
+  }
+}
+
+// 将一个节点插入到父节点的子节点数组中的指定位置，父节点的子节点还没有读取时只更新父节点指针
+function attachBookmarkNode(parentId, id, index) {
+  let siblings = bookmarkChildren.get(parentId); // 获取父节点的子节点数组
+  if (siblings && loadedFolders.has(parentId)) { // 如果父节点的子节点已经读取
+    siblings.splice(Math.min(index, siblings.length), 0, id); // 在指定位置插入该节点
+  }
+  let node = bookmarkNodes.get(id); // 获取该节点
+  if (node) node.parentId = parentId; // 更新该节点的父节点指针
+}
+
+// 监听收藏夹的变化，增量更新索引，而不是重新读取整个收藏夹，还没有读取的文件夹中的变化会被忽略
+function watchBookmarks() {
+  chrome.bookmarks.onCreated.addListener((id, node) => { // 新建了书签或文件夹
+    updateSearchIndex([], collectBookmarks(node)); // 将新的书签加入搜索索引
+    if (!loadedFolders.has(node.parentId)) return; // 如果父节点的子节点还没有读取，展开时会读取到新节点
+    indexBookmarks(node); // 将新节点加入索引
+    if (!node.url) loadedFolders.add(id); // 新建的文件夹没有子节点，不需要再读取
+    attachBookmarkNode(node.parentId, id, node.index); // 将新节点挂到父节点下
+    scheduleBookmarkRender(node.parentId, !node.url); // 刷新界面
+  });
+  chrome.bookmarks.onRemoved.addListener((id, removeInfo) => { // 删除了书签或文件夹
+    let isFolder = !removeInfo.node || !removeInfo.node.url; // 被删除的节点是否是文件夹
+    updateSearchIndex(removeInfo.node ? collectBookmarks(removeInfo.node).map(bookmark => bookmark.id) : [id], []); // 从搜索索引中删除该节点下的所有书签，没有节点信息时只删除该节点
+    detachBookmarkNode(removeInfo.parentId, id); // 将该节点从父节点下移除
+    removeBookmarkNode(id); // 从索引中删除该节点及其子节点
+    scheduleBookmarkRender(removeInfo.parentId, isFolder); // 刷新界面
+  });
+  chrome.bookmarks.onChanged.addListener((id, changeInfo) => { // 修改了书签或文件夹的标题或链接
+    let entry = searchEntries.get(id); // 获取索引中的书签，文件夹不在索引中
+    if (entry) updateSearchIndex([], [{id: id, title: changeInfo.title, url: changeInfo.url || entry.url}]); // 重新加入修改后的书签
+    let node = bookmarkNodes.get(id); // 获取该节点
+    if (!node) return; // 如果该节点不在索引中，就忽略
+    node.title = changeInfo.title; // 更新标题
+    if (changeInfo.url !== undefined) node.url = changeInfo.url; // 更新链接
+    scheduleBookmarkRender(node.parentId, !node.url); // 刷新界面
+  });
+  chrome.bookmarks.onMoved.addListener((id, moveInfo) => { // 移动了书签或文件夹
+    let node = bookmarkNodes.get(id); // 获取该节点
+    detachBookmarkNode(moveInfo.oldParentId, id); // 从原来的父节点下移除
+    if (node) { // 如果该节点在索引中
+      attachBookmarkNode(moveInfo.parentId, id, moveInfo.index); // 挂到新的父节点下
+    } else if (loadedFolders.has(moveInfo.parentId)) { // 如果从还没有读取的文件夹移到了已经读取的文件夹
+      loadFolder(moveInfo.parentId, () => scheduleBookmarkRender(moveInfo.parentId, true)); // 重新读取新的父节点的子节点
+      return;
+    }
+    let isFolder = !node || !node.url; // 被移动的节点是否是文件夹
+    scheduleBookmarkRender(moveInfo.oldParentId, isFolder); // 刷新原来的文件夹
+    scheduleBookmarkRender(moveInfo.parentId, isFolder); // 刷新新的文件夹
+  });
+  chrome.bookmarks.onChildrenReordered.addListener((id, reorderInfo) => { // 重新排序了文件夹的子节点
+    if (!loadedFolders.has(id)) return; // 如果该文件夹的子节点还没有读取，就忽略
+    bookmarkChildren.set(id, reorderInfo.childIds.slice()); // 直接替换子节点数组
+    scheduleBookmarkRender(id, true); // 刷新界面
+  });
+}
+
+// 合并短时间内的多次收藏夹变化，在下一帧统一刷新界面，避免批量导入时反复重绘
+function scheduleBookmarkRender(parentId, foldersChanged) {
+  if (foldersChanged) pendingRender.folders = true; // 文件夹结构变化了，需要刷新文件夹列表
+  if (parentId === currentFolder) pendingRender.shortcuts = true; // 当前文件夹变化了，需要刷新快捷方式
+  if (pendingRender.scheduled || !(pendingRender.folders || pendingRender.shortcuts)) return; // 已经安排过刷新，或者不需要刷新
+  pendingRender.scheduled = true; // 标记已经安排了刷新
+  requestAnimationFrame(() => { // 在下一帧刷新界面
+    if (pendingRender.folders) showFolders(); // 刷新文件夹列表
+    if (pendingRender.removed && !bookmarkNodes.has(currentFolder)) { // 如果当前文件夹已被删除，子节点还没有读取的文件夹不算，可能正在读取
+      let folders = getVisibleFolders(); // 获取可见的文件夹
+      currentFolder = folders.length ? folders[0][0] : rootFolder; // 改为展示第一个文件夹
+      pendingRender.shortcuts = true; // 需要刷新快捷方式
+    }
+    let refreshShortcuts = pendingRender.shortcuts; // 是否需要刷新快捷方式
+    pendingRender = {scheduled: false, folders: false, shortcuts: false, removed: false}; // 重置刷新状态
+    if (refreshShortcuts) { // 如果需要刷新快捷方式
+      showFolder(currentFolder); // 刷新快捷方式，第一个文件夹的子节点可能还需要读取
+    } else { // 否则
+      saveSnapshot(); // 保存最新的快照
+    }
+  });
+}
+
+// 根据收藏夹索引生成文件夹树中可见的文件夹按钮
+function showFolders() {
+  renderFolders(getVisibleFolders()); // 生成可见的文件夹按钮
+}
+
+// 生成文件夹按钮，folders为[id, 标题, 层级, 展开状态]数组，和当前显示的内容相同时不重绘
+function renderFolders(folders) {
+  let key = JSON.stringify(folders); // 序列化文件夹列表
+  if (key === shownFolders.key) return; // 如果和当前显示的相同，就不重绘
+  shownFolders = {key: key, items: folders}; // 记录当前显示的文件夹列表
+  let fragment = document.createDocumentFragment(); // 先在文档片段中生成所有按钮，最后一次性添加
+  for (let [folderId, title, depth, state] of folders) { // 遍历每个可见的文件夹
+    let folderButton = document.createElement("button"); // 创建一个文件夹按钮
+    folderButton.className = "folder-button"; // 设置文件夹按钮的类名
+    folderButton.dataset.id = folderId; // 记录文件夹的id，点击事件由文件夹列表统一处理
+    folderButton.style.setProperty("--depth", depth); // 设置文件夹的层级，用于缩进
+    let toggle = document.createElement("span"); // 创建一个展开按钮
+    toggle.className = "folder-toggle"; // 设置展开按钮的类名
+    toggle.dataset.state = state; // 设置展开状态，没有子文件夹时不显示展开按钮
+    let label = document.createElement("span"); // 创建文件夹标题
+    label.className = "folder-title"; // 设置文件夹标题的类名
+    label.textContent = title; // 设置文件夹标题的文本
+    folderButton.append(toggle, label); // 将展开按钮和标题添加到文件夹按钮中
+    fragment.appendChild(folderButton); // 将文件夹按钮添加到文档片段中
+  }
+  let focused = folderList.contains(document.activeElement) ? document.activeElement.dataset.id : null; // 重绘前获得焦点的文件夹
+  folderList.innerHTML = ""; // 清空文件夹列表的内容
+  folderList.appendChild(fragment); // 将所有按钮一次性添加到文件夹列表中
+  if (focused) { // 如果重绘前有文件夹按钮获得焦点
+    let folderButton = folderList.querySelector(`[data-id="${CSS.escape(focused)}"]`); // 找到重绘后的同一个文件夹按钮
+    if (folderButton) folderButton.focus(); // 恢复焦点，方便继续用键盘操作
+  }
+}
+
+// 获取文件夹树中可见的文件夹，只进入已展开的文件夹，按先序遍历的顺序排列
+function getVisibleFolders() {
+  let folders = []; // 创建一个空数组，用于存储可见的文件夹
+  let stack = []; // 待处理的[id, 层级]栈
+  let pushChildren = (id, depth) => { // 将一个文件夹的子文件夹倒序压栈，保持遍历顺序
+    let children = bookmarkChildren.get(id) || []; // 获取该文件夹的子节点
+    for (let i = children.length - 1; i >= 0; i--) { // 倒序遍历子节点
+      if (bookmarkChildren.has(children[i])) stack.push([children[i], depth]); // 只压入文件夹节点
+    }
+  };
+  pushChildren(rootFolder, 0); // 从根节点的子文件夹开始
+  while (stack.length) { // 当栈中还有文件夹时
+    let [id, depth] = stack.pop(); // 取出一个文件夹
+    let node = bookmarkNodes.get(id); // 获取该文件夹节点
+    let state = "collapsed"; // 默认是收起状态，还没有读取的文件夹可能有子文件夹
+    if (loadedFolders.has(id) && !bookmarkChildren.get(id).some(childId => bookmarkChildren.has(childId))) { // 如果已经读取且没有子文件夹
+      state = "leaf"; // 没有子文件夹，不需要展开按钮
+    } else if (expandedFolders.has(id) && loadedFolders.has(id)) { // 如果已经展开且读取了子节点
+      state = "expanded"; // 展开状态
+      pushChildren(id, depth + 1); // 继续遍历该文件夹的子文件夹
+    }
+    folders.push([id, node.title, depth, state]); // 将该文件夹添加到可见的文件夹数组中
+  }
+  return folders; // 返回可见的文件夹数组
+}
+
+// 获取一个文件夹下的直接子节点
+function getChildNodes(id) {
+  let children = bookmarkChildren.get(id) || []; // 获取该文件夹的子节点id
+  return children.map(childId => bookmarkNodes.get(childId)).filter(Boolean); // 从索引中取出子节点
+}
+
+// 根据收藏夹索引显示指定文件夹的快捷方式，按使用频率排列时常用的在前
+function showShortcuts(folderId) {
+  let shortcuts = getChildNodes(folderId).filter(node => node.url); // 筛选出快捷方式节点
+  if (sortByVisits) shortcuts = sortShortcuts(shortcuts); // 按使用频率排列
+  renderShortcuts(shortcuts.map(node => [node.id, node.title, node.url])); // 只取出快捷方式的id、标题和链接
+}
+
+// 按使用频率从高到低排列快捷方式，没有点击过的保持收藏夹中的顺序排在后面
+function sortShortcuts(nodes) {
+  let ranks = new Map(nodes.map(node => [node.id, visitRecords.has(node.id) ? visitRecords.get(node.id).rank : -Infinity])); // 每个快捷方式的排序值
+  return nodes.slice().sort((a, b) => ranks.get(b.id) - ranks.get(a.id) || 0); // 排序值相同时保持原来的顺序
+}
+
+// 设置是否按使用频率排列快捷方式，并同步按钮的状态
+function setSortByVisits(enabled) {
+  sortByVisits = enabled; // 设置排序方式
+  sortButton.setAttribute("aria-pressed", enabled); // 同步按钮的状态
+}
+
+// 从IndexedDB读取所有快捷方式的点击统计，读取后按使用频率重新排列当前文件夹
+function loadVisits() {
+  openDatabase().then(db => { // 打开数据库
+    return requestPromise(db.transaction("visits").objectStore("visits").getAll()); // 读取所有点击统计
+  }).then(records => { // 读取成功
+    for (let record of records) if (!visitRecords.has(record.id)) visitRecords.set(record.id, record); // 放入内存，读取期间点击过的以内存中的为准
+    if (sortByVisits && bookmarksReady) showFolder(currentFolder); // 重新排列当前文件夹
+  }).catch(() => {}); // 如果浏览器不支持或数据库出错，就只统计本次打开的页面
+}
+
+// 记录一次快捷方式的点击，统计稍后批量写入数据库，不影响打开链接
+// 排序值rank是以2为底的点击次数的对数加上经过的半衰期数，点击次数随时间衰减，但所有快捷方式衰减的比例相同，
+// 所以只需要在点击时更新被点击的快捷方式，不需要重新计算其他快捷方式
+function recordVisit(id) {
+  let now = Date.now(); // 当前时间
+  let record = visitRecords.get(id) || {id: id, count: 0, usedAt: now, rank: -Infinity}; // 该快捷方式的点击统计
+  let score = Math.pow(2, record.rank - now / visitHalfLife) + 1; // 衰减到现在的点击次数，加上这一次
+  visitRecords.set(id, {id: id, count: record.count + 1, usedAt: now, rank: Math.log2(score) + now / visitHalfLife}); // 更新内存中的统计
+  visitTouched.add(id); // 记录需要写入的快捷方式
+  if (visitFlushTimer) return; // 如果已经安排过写入，就不重复安排
+  visitFlushTimer = setTimeout(flushVisits, 2000); // 2秒后批量写入
+}
+
+// 将快捷方式的点击统计批量写入数据库
+function flushVisits() {
+  clearTimeout(visitFlushTimer); // 取消已经安排的写入
+  visitFlushTimer = 0; // 重置写入状态
+  if (!visitTouched.size) return; // 如果没有需要写入的统计，就不处理
+  let records = [...visitTouched].map(id => visitRecords.get(id)).filter(Boolean); // 需要写入的统计
+  visitTouched.clear(); // 清空需要写入的快捷方式
+  openDatabase().then(db => { // 打开数据库
+    let transaction = db.transaction("visits", "readwrite"); // 创建读写事务
+    let store = transaction.objectStore("visits"); // 获取点击统计表
+    for (let record of records) store.put(record); // 保存每个快捷方式的统计
+    return transactionPromise(transaction); // 等待事务提交
+  }).catch(() => {}); // 写入失败时忽略，只影响排序
+}
+
+// 生成快捷方式按钮，shortcuts为[id, 标题, 链接]数组，和当前显示的内容相同时不重绘，已有的按钮按id复用
+function renderShortcuts(shortcuts) {
+  let key = JSON.stringify(shortcuts); // 序列化快捷方式列表
+  if (key === shownShortcuts.key) return; // 如果和当前显示的相同，就不重绘
+  let sameFolder = shownShortcuts.folder === currentFolder; // 是否是同一个文件夹的刷新
+  if (!sameFolder) folderScroll.set(shownShortcuts.folder, shortcutList.scrollTop); // 记录上一个文件夹的滚动位置
+  let scrollTop = sameFolder ? shortcutList.scrollTop : folderScroll.get(currentFolder) || 0; // 刷新后要恢复的滚动位置
+  shownShortcuts = {key: key, items: shortcuts, folder: currentFolder}; // 记录当前显示的快捷方式列表
+  let virtual = shortcuts.length > virtualThreshold; // 如果快捷方式太多，就只渲染可见的行
+  shortcutWindow = {virtual: virtual, start: 0, end: 0, columns: 0}; // 重置渲染范围
+  shortcutList.classList.toggle("virtual", virtual); // 设置是否为虚拟列表
+  let spacers = shortcutList.querySelectorAll(".shortcut-spacer"); // 获取上下两个占位元素
+  if (virtual && !spacers.length) { // 如果变为虚拟列表
+    shortcutList.prepend(createSpacer()); // 在开头添加占位元素，表示上方未渲染的行
+    shortcutList.append(createSpacer()); // 在末尾添加占位元素，表示下方未渲染的行
+  } else if (!virtual) { // 如果不是虚拟列表
+    spacers.forEach(spacer => spacer.remove()); // 移除占位元素
+  }
+  if (virtual) { // 如果是虚拟列表
+    renderShortcutWindow(); // 先渲染第一屏，用于测量按钮尺寸
+    measureShortcutSize(); // 测量按钮的实际尺寸
+  } else { // 如果快捷方式不多，就全部渲染
+    reconcileShortcuts(shortcuts, null); // 按id协调全部快捷方式按钮
+  }
+  shortcutList.scrollTop = scrollTop; // 恢复滚动位置
+  if (virtual) renderShortcutWindow(); // 按恢复后的滚动位置渲染可见的行
+}
+
+// 按id协调快捷方式按钮：id相同的按钮原样保留，不再需要的按钮优先给图标相同的快捷方式复用，
+// 避免重新加载和解码图标，只有不够用时才创建新按钮，最后移除多余的按钮
+function reconcileShortcuts(shortcuts, topSpacer) {
+  let previous = shortcutButtons; // 协调前的按钮
+  let next = new Map(); // 协调后的按钮
+  let buttons = []; // 按顺序排列的按钮
+  let missing = []; // 没有对应按钮的快捷方式的位置
   for (let shortcut of shortcuts) { // 遍历每个快捷方式
-    let shortcutButton = document.createElement("button"); // 创建一个快捷方式按钮
-    shortcutButton.className = "shortcut-button"; // 设置快捷方式按钮的类名
-    shortcutButton.innerHTML = `<img src="${getDomain(shortcut.url)}/favicon.ico" alt="快捷方式图标" onerror="this.style.display='none'">${shortcut.title}`; // 设置快捷方式按钮的内容，包括图标和标题，如果图标无法加载，就隐藏图标
-    shortcutButton.onclick = function() { // 设置快捷方式按钮的点击事件
-      window.open(shortcut.url, "_blank"); // 在新标签页中打开快捷方式的链接
-    };
-    shortcutList.appendChild(shortcutButton); // 将快捷方式按钮添加到快捷方式列表中
+    let button = previous.get(shortcut[0]); // 查找id相同的按钮
+    if (button) previous.delete(shortcut[0]); // 如果找到了，就从协调前的按钮中取出
+    else missing.push(buttons.length); // 否则记录位置，稍后分配按钮
+    buttons.push(button); // 按顺序记录按钮
+  }
+  let spare = new Map(); // 可以复用的按钮，域名 -> 按钮数组
+  for (let button of previous.values()) { // 遍历不再需要的按钮
+    let origin = button.dataset.origin; // 获取按钮图标所属的网站
+    if (!spare.has(origin)) spare.set(origin, []); // 按网站分组
+    spare.get(origin).push(button); // 放入可以复用的按钮
+  }
+  let unused = new Set(previous.values()); // 还没有被复用的按钮
+  for (let index of missing) { // 为没有对应按钮的快捷方式分配按钮
+    let sameIcon = spare.get(getDomain(shortcuts[index][2])) || []; // 图标相同的可以复用的按钮
+    let button = sameIcon.pop(); // 优先复用图标相同的按钮
+    while (button && !unused.has(button)) button = sameIcon.pop(); // 跳过已经被复用的按钮
+    if (!button) { // 如果没有图标相同的按钮
+      button = unused.values().next().value || createShortcutButton(); // 复用任意一个按钮，没有才创建
+    }
+    unused.delete(button); // 该按钮已经被复用
+    buttons[index] = button; // 记录该位置的按钮
+  }
+  let cursor = topSpacer ? topSpacer.nextSibling : shortcutList.firstChild; // 当前位置上已有的节点
+  let fragment = document.createDocumentFragment(); // 连续的新按钮先放入文档片段，再一次性插入
+  shortcuts.forEach((shortcut, index) => { // 按顺序放置每个按钮
+    let button = buttons[index]; // 该位置的按钮
+    fillShortcutButton(button, shortcut); // 更新按钮的内容，没有变化的部分不会改动
+    next.set(shortcut[0], button); // 记录协调后的按钮
+    while (cursor && unused.has(cursor)) cursor = cursor.nextSibling; // 跳过将被移除的按钮
+    if (button === cursor) { // 如果按钮已经在正确的位置上
+      if (fragment.firstChild) shortcutList.insertBefore(fragment, cursor); // 先插入前面的新按钮
+      cursor = cursor.nextSibling; // 移动到下一个位置
+    } else if (!button.isConnected) { // 如果是新按钮或已经移出列表的按钮
+      fragment.appendChild(button); // 放入文档片段
+    } else { // 如果按钮在其他位置上
+      if (fragment.firstChild) shortcutList.insertBefore(fragment, cursor); // 先插入前面的新按钮
+      shortcutList.insertBefore(button, cursor); // 将按钮移动到当前位置
+    }
+  });
+  while (cursor && unused.has(cursor)) cursor = cursor.nextSibling; // 跳过将被移除的按钮
+  if (fragment.firstChild) shortcutList.insertBefore(fragment, cursor); // 插入剩余的新按钮
+  for (let button of unused) button.remove(); // 移除多余的按钮
+  shortcutButtons = next; // 记录协调后的按钮
+}
+
+// 创建一个占位元素，占满一整行，高度表示未渲染的行
+function createSpacer() {
+  let spacer = document.createElement("div"); // 创建一个占位元素
+  spacer.className = "shortcut-spacer"; // 设置占位元素的类名
+  return spacer; // 返回占位元素
+}
+
+// 测量快捷方式按钮加上外边距后的尺寸，测量结果变化时重新渲染可见的行
+function measureShortcutSize() {
+  let button = shortcutList.querySelector(".shortcut-button"); // 获取一个已经渲染的按钮
+  if (!button) return; // 如果没有按钮，就使用默认尺寸
+  let style = getComputedStyle(button); // 获取按钮的样式
+  let size = button.offsetHeight + parseFloat(style.marginTop) + parseFloat(style.marginBottom); // 计算按钮占用的高度
+  if (size > 0 && size !== shortcutSize) { // 如果和默认尺寸不同
+    shortcutSize = size; // 更新按钮尺寸
+    shortcutWindow.start = shortcutWindow.end = 0; // 使当前的渲染范围失效
+    renderShortcutWindow(); // 重新渲染可见的行
+  }
+}
+
+// 渲染虚拟列表中可见的行，滚出可见区域的按钮会被回收，用来显示新滚入的快捷方式
+function renderShortcutWindow() {
+  let items = shownShortcuts.items; // 当前文件夹的全部快捷方式
+  let columns = Math.max(1, Math.floor(shortcutList.clientWidth / shortcutSize)); // 每行能放下的按钮数量，和换行布局一致
+  let rows = Math.ceil(items.length / columns); // 总行数
+  let [topSpacer, bottomSpacer] = shortcutList.querySelectorAll(".shortcut-spacer"); // 获取上下两个占位元素
+  if (shortcutWindow.columns && columns !== shortcutWindow.columns) { // 如果窗口缩放导致每行的按钮数量变化
+    let firstVisible = Math.floor(shortcutList.scrollTop / shortcutSize) * shortcutWindow.columns; // 缩放前第一个可见的快捷方式
+    let offset = shortcutList.scrollTop % shortcutSize; // 第一个可见的行被遮住的高度
+    bottomSpacer.style.height = rows * shortcutSize + "px"; // 先撑开足够的滚动高度，避免滚动位置被截断
+    shortcutList.scrollTop = Math.floor(firstVisible / columns) * shortcutSize + offset; // 保持该快捷方式仍然可见
+  }
+  let firstRow = Math.max(0, Math.floor(shortcutList.scrollTop / shortcutSize) - overscanRows); // 第一个要渲染的行
+  let lastRow = Math.min(rows, Math.ceil((shortcutList.scrollTop + shortcutList.clientHeight) / shortcutSize) + overscanRows); // 最后一个要渲染的行之后的行
+  let start = firstRow * columns; // 第一个要渲染的快捷方式的序号
+  let end = Math.min(items.length, lastRow * columns); // 最后一个要渲染的快捷方式之后的序号
+  if (start === shortcutWindow.start && end === shortcutWindow.end && columns === shortcutWindow.columns) return; // 如果范围没有变化，就不重绘
+  topSpacer.style.height = firstRow * shortcutSize + "px"; // 上方未渲染的行的高度
+  bottomSpacer.style.height = (rows - lastRow) * shortcutSize + "px"; // 下方未渲染的行的高度
+  reconcileShortcuts(items.slice(start, end), topSpacer); // 按id协调可见的快捷方式按钮，滚出的按钮给滚入的快捷方式复用
+  shortcutWindow.start = start; // 记录渲染范围的开始
+  shortcutWindow.end = end; // 记录渲染范围的结束
+  shortcutWindow.columns = columns; // 记录每行的按钮数量
+}
+
+// 在下一帧重新渲染虚拟列表中可见的行，合并同一帧内的多次滚动和缩放
+function scheduleShortcutWindow() {
+  if (!shortcutWindow.virtual || shortcutWindow.scheduled) return; // 如果不是虚拟列表，或者已经安排过渲染
+  shortcutWindow.scheduled = true; // 标记已经安排了渲染
+  requestAnimationFrame(() => { // 在下一帧渲染
+    shortcutWindow.scheduled = false; // 重置渲染状态
+    if (shortcutWindow.virtual) renderShortcutWindow(); // 渲染可见的行
+  });
+}
+
+// 从模板克隆一个空的快捷方式按钮，不需要解析HTML
+function createShortcutButton() {
+  return shortcutTemplate.content.firstElementChild.cloneNode(true); // 克隆模板中的按钮
+}
+
+// 填充快捷方式按钮的内容，新建、回收和复用的按钮都使用这个函数，只改动变化了的部分，
+// 标题作为纯文本填入，不会被当作HTML解析
+function fillShortcutButton(shortcutButton, [id, title, url]) {
+  setShortcutIcon(shortcutButton, getDomain(url), url); // 设置快捷方式的图标
+  let label = shortcutButton.lastElementChild; // 获取快捷方式的标题
+  if (label.textContent !== title) label.textContent = title; // 设置快捷方式的标题
+  if (shortcutButton.dataset.id !== id) shortcutButton.dataset.id = id; // 记录快捷方式的id，点击事件由快捷方式列表统一处理
+}
+
+// 设置快捷方式按钮的图标，图标已经缓存时同步显示，没有缓存时先不显示，获取后再更新
+function setShortcutIcon(shortcutButton, origin, url) {
+  let icon = shortcutButton.firstElementChild; // 获取快捷方式图标
+  let src = getFaviconSrc(origin, url); // 获取图标的链接
+  if (shortcutButton.dataset.origin !== origin) shortcutButton.dataset.origin = origin; // 记录图标所属的网站
+  if ((icon.getAttribute("src") || "") === src) return; // 如果图标没有变化，就不处理
+  icon.style.display = ""; // 重新显示图标，之前的图标可能加载失败被隐藏了
+  if (src) icon.src = src; // 设置图标的链接
+  else icon.removeAttribute("src"); // 没有图标时不设置链接
+}
+
+// 从IndexedDB读取所有缓存的图标，一次读取后放在内存中，渲染时可以同步取得图标，对象URL在第一次显示时才创建
+function loadFavicons() {
+  openDatabase().then(db => { // 打开数据库
+    return requestPromise(db.transaction("favicons").objectStore("favicons").getAll()); // 读取所有缓存的图标
+  }).then(records => { // 读取成功
+    for (let record of records) cacheFavicon(record); // 将每个图标放入内存
+    faviconStore = "ready"; // 标记图标缓存可用
+  }).catch(() => { // 如果浏览器不支持或数据库出错
+    faviconStore = "unavailable"; // 不使用图标缓存，直接从网站加载图标
+  }).then(() => {
+    updateShortcutIcons(); // 更新已经显示的快捷方式的图标
+  });
+}
+
+// 将一条图标记录放入内存，释放原来的对象URL，新的对象URL在显示时再创建
+function cacheFavicon(record) {
+  let previous = faviconRecords.get(record.origin); // 该域名原来的记录
+  if (previous) faviconBytes -= previous.size; // 减去原来的图标大小
+  let previousUrl = faviconUrls.get(record.origin); // 该域名原来的对象URL
+  if (previousUrl) URL.revokeObjectURL(previousUrl); // 释放原来的对象URL
+  faviconUrls.delete(record.origin); // 下次显示时为新的图标创建对象URL
+  faviconRecords.set(record.origin, record); // 记录新的图标
+  faviconBytes += record.size; // 加上新的图标大小
+}
+
+// 同步获取一个网站的图标链接，没有缓存时返回空字符串，并在后台获取图标
+function getFaviconSrc(origin, pageUrl) {
+  if (!origin.startsWith("https:") && !origin.startsWith("http:")) return ""; // 其他链接没有图标
+  if (faviconStore === "unavailable") return origin + "/favicon.ico"; // 如果图标缓存不可用，就直接从网站加载图标
+  if (faviconStore === "loading") return ""; // 如果图标缓存还在读取，读取完成后会更新图标
+  let record = faviconRecords.get(origin); // 获取该网站的图标记录
+  if (!record) { // 如果还没有缓存
+    queueFavicon(origin, pageUrl); // 在后台获取图标
+    return ""; // 暂时不显示图标
+  }
+  let now = Date.now(); // 当前时间
+  if (now - record.fetchedAt > (record.blob ? faviconTTL : faviconMissTTL)) queueFavicon(origin, pageUrl); // 如果缓存已经过期，先用旧的图标，同时在后台重新获取
+  if (now - record.usedAt > faviconTouchInterval) touchFavicon(origin); // 记录该图标被使用了，用于淘汰最久没用的图标
+  let src = faviconUrls.get(origin); // 获取已经创建的对象URL
+  if (src === undefined) { // 如果是第一次显示该图标
+    src = record.blob ? URL.createObjectURL(record.blob) : ""; // 为图标创建对象URL，获取失败的记录对应空字符串
+    faviconUrls.set(origin, src); // 记录对象URL，之后重复使用
+  }
+  return src; // 返回图标的对象URL
+}
+
+// 将一个网站加入图标获取队列，同一个网站只获取一次
+function queueFavicon(origin, pageUrl) {
+  if (faviconQueue.has(origin) || faviconFetching.has(origin)) return; // 如果已经在队列中或正在获取，就忽略
+  faviconQueue.set(origin, pageUrl); // 加入队列
+  pumpFavicons(); // 开始获取
+}
+
+// 从队列中取出网站获取图标，同时进行的请求数量有上限
+function pumpFavicons() {
+  while (faviconFetching.size < faviconConcurrency && faviconQueue.size) { // 当还可以发出请求且队列不为空时
+    let [origin, pageUrl] = faviconQueue.entries().next().value; // 取出队列中的第一个网站
+    faviconQueue.delete(origin); // 从队列中移除
+    faviconFetching.add(origin); // 标记正在获取
+    fetchFavicon(origin, pageUrl).then(blob => { // 获取图标
+      storeFavicon(origin, blob); // 缓存图标
+    }).finally(() => { // 无论成功还是失败
+      faviconFetching.delete(origin); // 取消正在获取的标记
+      pumpFavicons(); // 继续获取队列中的下一个网站
+    });
+  }
+}
+
+// 获取一个网站的图标，优先从浏览器本地的图标库读取，本地没有时才从网站获取，http网站拓展没有权限读取，只从本地读取，
+// 返回一个Promise，结果为图标的Blob，获取失败时为null
+function fetchFavicon(origin, pageUrl) {
+  return fetchLocalFavicon(pageUrl).then(blob => blob || (origin.startsWith("https:") ? fetchRemoteFavicon(origin) : null)); // 本地没有时从网站获取
+}
+
+// 从浏览器本地的图标库读取一个页面的图标，需要favicon权限，不产生网络请求，
+// 浏览器没有该页面的图标时会返回默认图标，这时返回null
+function fetchLocalFavicon(pageUrl) {
+  return Promise.all([readLocalFavicon(pageUrl), getDefaultFavicon()]).then(([blob, fallback]) => { // 同时读取该页面的图标和默认图标
+    if (!blob || !fallback || blob.size !== fallback.size) return blob; // 大小不同时一定不是默认图标
+    return Promise.all([blob.arrayBuffer(), fallback.arrayBuffer()]).then(([a, b]) => { // 大小相同时逐字节比较
+      let x = new Uint8Array(a), y = new Uint8Array(b); // 两个图标的字节
+      return x.every((byte, i) => byte === y[i]) ? null : blob; // 和默认图标相同时表示本地没有该页面的图标
+    });
+  });
+}
+
+// 从浏览器本地的图标库读取图标，读取失败时为null
+function readLocalFavicon(pageUrl) {
+  let url = chrome.runtime.getURL("/_favicon/?pageUrl=" + encodeURIComponent(pageUrl) + "&size=32"); // 浏览器图标库的地址
+  return fetch(url).then(response => response.ok ? response.blob() : null).catch(() => null); // 读取图标
+}
+
+// 获取浏览器图标库的默认图标，用一个不存在的页面读取，只读取一次
+function getDefaultFavicon() {
+  if (!defaultFavicon) defaultFavicon = readLocalFavicon("https://favicon.invalid/"); // 读取一个不存在的页面的图标
+  return defaultFavicon; // 返回默认图标
+}
+
+// 从网站获取图标，返回一个Promise，结果为图标的Blob，获取失败时为null
+function fetchRemoteFavicon(origin) {
+  return fetch(origin + "/favicon.ico", {credentials: "omit"}).then(response => { // 请求网站的favicon.ico
+    return response.ok ? response.blob() : null; // 请求成功时读取图标
+  }).then(blob => { // 检查图标
+    return blob && blob.size && !blob.type.startsWith("text/") ? blob : null; // 忽略空文件和网页，有些网站找不到图标时会返回网页
+  }).catch(() => null); // 网络错误时返回null
+}
+
+// 缓存获取到的图标，获取失败时也记录下来，在有效期内不再重试
+function storeFavicon(origin, blob) {
+  let previous = faviconRecords.get(origin); // 该网站原来的记录
+  if (!blob && previous && previous.blob) blob = previous.blob; // 如果重新获取失败，就继续使用原来的图标
+  let now = Date.now(); // 当前时间
+  let record = {origin: origin, blob: blob, size: blob ? blob.size : 0, fetchedAt: now, usedAt: now}; // 新的图标记录
+  cacheFavicon(record); // 放入内存
+  updateShortcutIcons(origin); // 更新该网站的快捷方式的图标
+  openDatabase().then(db => { // 打开数据库
+    let transaction = db.transaction("favicons", "readwrite"); // 创建读写事务
+    transaction.objectStore("favicons").put(record); // 保存图标记录
+    return transactionPromise(transaction); // 等待事务提交
+  }).then(evictFavicons).catch(() => {}); // 保存后检查缓存大小，保存失败时只在内存中使用
+}
+
+// 记录一个图标被使用了，使用时间稍后批量写入数据库，不影响渲染
+function touchFavicon(origin) {
+  faviconRecords.get(origin).usedAt = Date.now(); // 更新内存中的使用时间
+  faviconTouched.add(origin); // 记录需要写入的图标
+  if (faviconFlushTimer) return; // 如果已经安排过写入，就不重复安排
+  faviconFlushTimer = setTimeout(flushFavicons, 2000); // 2秒后批量写入
+}
+
+// 将图标的使用时间批量写入数据库
+function flushFavicons() {
+  clearTimeout(faviconFlushTimer); // 取消已经安排的写入
+  faviconFlushTimer = 0; // 重置写入状态
+  if (!faviconTouched.size) return; // 如果没有需要写入的图标，就不处理
+  let records = [...faviconTouched].map(origin => faviconRecords.get(origin)).filter(Boolean); // 需要写入的图标记录
+  faviconTouched.clear(); // 清空需要写入的图标
+  openDatabase().then(db => { // 打开数据库
+    let transaction = db.transaction("favicons", "readwrite"); // 创建读写事务
+    let store = transaction.objectStore("favicons"); // 获取图标表
+    for (let record of records) store.put(record); // 保存每个图标记录
+    return transactionPromise(transaction); // 等待事务提交
+  }).catch(() => {}); // 写入失败时忽略，只影响淘汰顺序
+}
+
+// 图标缓存超过大小上限时，淘汰最久没有使用的图标，直到低于上限的90%
+function evictFavicons() {
+  if (faviconBytes <= faviconBudget) return; // 如果没有超过上限，就不处理
+  let records = [...faviconRecords.values()].sort((a, b) => a.usedAt - b.usedAt); // 按使用时间从旧到新排序
+  let evicted = []; // 被淘汰的网站
+  for (let record of records) { // 从最久没有使用的图标开始
+    if (faviconBytes <= faviconBudget * 0.9) break; // 如果已经低于上限的90%，就停止淘汰
+    faviconBytes -= record.size; // 减去该图标的大小
+    faviconRecords.delete(record.origin); // 从内存中删除该图标
+    let url = faviconUrls.get(record.origin); // 获取该图标的对象URL
+    if (url) URL.revokeObjectURL(url); // 释放对象URL
+    faviconUrls.delete(record.origin); // 删除对象URL
+    evicted.push(record.origin); // 记录被淘汰的网站
+  }
+  openDatabase().then(db => { // 打开数据库
+    let transaction = db.transaction("favicons", "readwrite"); // 创建读写事务
+    let store = transaction.objectStore("favicons"); // 获取图标表
+    for (let origin of evicted) store.delete(origin); // 删除被淘汰的图标
+    return transactionPromise(transaction); // 等待事务提交
+  }).catch(() => {}); // 删除失败时忽略，下次读取时会重新淘汰
+}
+
+// 更新已经显示的快捷方式和搜索结果的图标，指定origin时只更新该网站的快捷方式
+function updateShortcutIcons(origin) {
+  for (let button of [...shortcutButtons.values(), ...searchResults.children]) { // 遍历当前渲染的快捷方式按钮和搜索结果
+    if (origin && button.dataset.origin !== origin) continue; // 如果不是指定的网站，就跳过
+    let url = getShortcutUrl(button.dataset.id); // 获取快捷方式的链接
+    if (url) setShortcutIcon(button, getDomain(url), url); // 更新图标
+  }
+}
+
+// 读取整个收藏夹，编码后转移给搜索线程，由搜索线程读取拼音字典并建立索引，不阻塞输入
+function loadSearchIndex() {
+  if (searchIndexState !== "idle") return; // 如果已经建立或正在建立，就忽略
+  searchIndexState = "loading"; // 标记正在读取收藏夹
+  let worker = searchWorker = new Worker("search-worker.js"); // 创建搜索线程
+  worker.onmessage = event => showSearchMatches(event.data); // 接收搜索线程返回的结果
+  worker.onerror = () => { // 搜索线程出错时
+    worker.terminate(); // 结束搜索线程
+    searchWorker = null; // 下次使用搜索框时重新创建
+    searchIndexState = "idle"; // 标记需要重新建立
+    searchMatches = {query: "", items: []}; // 清空搜索结果
+  };
+  chrome.bookmarks.getTree(tree => { // 从浏览器获取整个收藏夹
+    if (worker !== searchWorker) return; // 如果读取期间搜索线程出错了，就忽略
+    let bookmarks = collectBookmarks(tree[0]); // 收集所有书签
+    searchEntries.clear(); // 清空上次建立的索引中的书签
+    for (let bookmark of bookmarks) searchEntries.set(bookmark.id, bookmark); // 记录每个书签
+    let buffer = encodeSearchEntries(bookmarks); // 编码为一个ArrayBuffer
+    worker.postMessage({type: "load", buffer: buffer}, [buffer]); // 转移给搜索线程，不复制
+    searchIndexState = "ready"; // 之后的查询会排在建立索引之后处理
+    for (let update of pendingSearchUpdates) updateSearchIndex(update[0], update[1]); // 补上读取期间的变化，重复的变化不影响结果
+    pendingSearchUpdates = []; // 清空读取期间的变化
+    showSearchResults(); // 查询已经输入的内容
+  });
+}
+
+// 收集一个节点及其所有子节点中的书签，使用显式栈遍历
+function collectBookmarks(root) {
+  let bookmarks = []; // 收集到的书签
+  let stack = [root]; // 待处理的节点栈
+  while (stack.length) { // 当栈中还有节点时
+    let node = stack.pop(); // 取出一个节点
+    if (node.url) bookmarks.push(node); // 记录书签
+    if (node.children) stack.push(...node.children); // 继续遍历子节点
+  }
+  return bookmarks; // 返回收集到的书签
+}
+
+// 收藏夹变化时增量更新搜索索引，removed为删除的书签id，added为新增或修改的书签，正在读取收藏夹时读取后再更新
+function updateSearchIndex(removed, added) {
+  if (searchIndexState === "loading") { // 如果正在读取收藏夹
+    pendingSearchUpdates.push([removed, added]); // 读取后再更新
+  } else if (searchIndexState === "ready") { // 如果索引已经交给搜索线程
+    for (let id of removed) searchEntries.delete(id); // 删除书签
+    for (let node of added) searchEntries.set(node.id, node); // 加入书签
+    let buffer = encodeSearchEntries(added); // 编码新增或修改的书签
+    searchWorker.postMessage({type: "update", removed: removed, added: buffer}, [buffer]); // 转移给搜索线程
+    searchedQuery = ""; // 索引变化了，需要重新查询
+    if (!searchResults.hidden) showSearchResults(); // 刷新显示中的搜索结果
+  }
+}
+
+// 显示搜索线程返回的结果，只处理最近一次查询的结果
+function showSearchMatches(message) {
+  if (message.type !== "results" || message.query !== searchedQuery) return; // 忽略已经过时的结果
+  searchMatches = {query: message.query, items: message.ids.map(id => searchEntries.get(id)).filter(Boolean)}; // 取出书签的标题和链接
+  showSearchResults(); // 刷新搜索结果
+}
+
+// 按搜索框中的内容显示匹配的书签和搜索建议，索引还没有建立时先建立索引，书签的查询交给搜索线程，结果返回后再刷新
+function showSearchResults() {
+  let query = searchInput.value; // 搜索框中的内容
+  if (!query.trim() || document.activeElement !== searchInput) { // 如果没有输入内容，或者搜索框没有焦点
+    cancelSuggestions(); // 取消等待中的搜索建议请求
+    searchMatches = {query: "", items: []}; // 清空书签的查询结果
+    searchedQuery = ""; // 下次输入时重新查询
+    renderSearchResults([]); // 不显示搜索结果
+    return;
+  }
+  loadSearchIndex(); // 确保索引已经建立或正在建立
+  if (searchIndexState === "ready" && searchedQuery !== query) { // 如果还没有查询过该内容
+    searchedQuery = query; // 记录查询
+    searchWorker.postMessage({type: "search", query: query}); // 交给搜索线程查询
+  }
+  renderSearchResults(searchMatches.items.concat(getSuggestions(query))); // 书签在前，搜索建议在后
+}
+
+// 获取搜索建议的请求链接，没有可用的接口时返回空字符串
+function getSuggestUrl(query) {
+  let endpoint = suggestEndpoint || currentEngine.suggest; // 优先使用设置的接口，否则使用当前搜索引擎的接口
+  return endpoint ? endpoint.replace("%s", encodeURIComponent(query)) : ""; // 填入查询
+}
+
+// 获取一个查询的搜索建议，没有缓存时在停止输入后请求，请求返回前先用缓存中最长的前缀的建议，避免列表闪烁
+function getSuggestions(query) {
+  let url = getSuggestUrl(query); // 请求链接
+  if (!url) return []; // 当前搜索引擎没有搜索建议
+  let suggestions = suggestCache.get(url); // 从缓存中获取
+  if (suggestions) { // 如果已经缓存
+    suggestCache.delete(url); // 移到最后，标记为最近用过
+    suggestCache.set(url, suggestions); // 重新加入缓存
+    cancelSuggestions(); // 取消之前的请求，已经不需要了
+  } else { // 如果还没有缓存
+    if (suggestRequest.url !== url) requestSuggestions(url); // 请求该查询的建议，同一个查询不重复请求
+    let normalized = query.toLowerCase(); // 用于前缀比较
+    for (let length = query.length - 1; length > 0 && !suggestions; length--) { // 从长到短查找缓存过的前缀
+      let cached = suggestCache.get(getSuggestUrl(query.slice(0, length))); // 该前缀的建议
+      if (cached) suggestions = cached.filter(text => text.toLowerCase().startsWith(normalized)); // 只保留仍然匹配的建议
+    }
+  }
+  return (suggestions || []).filter(text => text !== query).map(text => ({suggestion: text})); // 不显示和输入相同的建议
+}
+
+// 停止输入suggestDelay毫秒后请求搜索建议，新的请求会中止之前还没有完成的请求
+function requestSuggestions(url) {
+  cancelSuggestions(); // 中止之前的请求
+  let controller = new AbortController(); // 用于中止本次请求
+  suggestRequest = {url: url, controller: controller}; // 记录本次请求
+  suggestTimer = setTimeout(() => { // 停止输入后再请求
+    fetch(url, {signal: controller.signal, credentials: "omit"}).then(response => { // 请求搜索建议，不携带Cookie
+      if (!response.ok) throw new Error("suggest " + response.status); // 限流或服务器出错时不缓存，和请求失败一样下次输入时重试
+      return response.json(); // 读取JSON
+    }).then(data => {
+      if (!Array.isArray(data) || !Array.isArray(data[1])) throw new Error("suggest format"); // 不是OpenSearch格式时不缓存
+      let suggestions = data[1].filter(text => typeof text === "string").slice(0, suggestLimit); // 解析OpenSearch格式的建议
+      suggestCache.set(url, suggestions); // 只缓存成功的请求
+      if (suggestCache.size > suggestCacheSize) suggestCache.delete(suggestCache.keys().next().value); // 淘汰最久没用的
+      if (suggestRequest.controller === controller) suggestRequest = {url: "", controller: null}; // 请求完成
+      showSearchResults(); // 刷新搜索结果，查询已经变化时会使用新的查询
+    }).catch(() => { // 请求被中止或失败
+      if (suggestRequest.controller === controller) suggestRequest = {url: "", controller: null}; // 请求结束，失败的查询下次输入时重试
+    });
+  }, suggestDelay);
+}
+
+// 取消等待中的搜索建议请求，中止进行中的请求
+function cancelSuggestions() {
+  clearTimeout(suggestTimer); // 取消还没有发出的请求
+  if (suggestRequest.controller) suggestRequest.controller.abort(); // 中止进行中的请求
+  suggestRequest = {url: "", controller: null}; // 没有请求了
+}
+
+// 用搜索引擎搜索一个搜索建议
+function submitSuggestion(text) {
+  searchInput.value = text; // 填入搜索框
+  renderSearchResults([]); // 关闭搜索结果
+  searchBox.requestSubmit(); // 提交搜索，和在搜索框中按回车相同
+}
+
+// 生成搜索结果列表，和当前显示的结果相同时不重绘
+function renderSearchResults(items) {
+  let key = JSON.stringify(items.map(item => item.suggestion === undefined ? [item.id, item.title, item.url] : [item.suggestion])); // 序列化搜索结果
+  if (key === shownResults.key) return; // 如果和当前显示的相同，就不重绘
+  shownResults = {key: key, items: items, selected: -1}; // 记录当前显示的搜索结果，重新选择
+  let fragment = document.createDocumentFragment(); // 先放入文档片段，再一次性插入
+  items.forEach((item, index) => { // 遍历每个搜索结果
+    let row = document.createElement("li"); // 创建一个搜索结果
+    row.className = "search-result"; // 设置搜索结果的类名
+    row.id = "search-result-" + index; // 设置id，用于标记选中的结果
+    row.setAttribute("role", "option"); // 设置为列表的选项
+    if (item.suggestion !== undefined) { // 如果是搜索建议
+      let text = document.createElement("span"); // 创建建议的文字
+      text.className = "search-result-title"; // 和书签标题的样式相同
+      text.textContent = item.suggestion; // 作为纯文本填入
+      row.classList.add("search-suggestion"); // 设置搜索建议的类名
+      row.dataset.suggestion = item.suggestion; // 记录建议，点击事件由搜索结果列表统一处理
+      row.append(text); // 组合搜索建议
+      fragment.appendChild(row); // 放入文档片段
+      return;
+    }
+    row.dataset.id = item.id; // 记录书签的id，点击事件由搜索结果列表统一处理
+    let icon = document.createElement("img"); // 创建书签图标
+    icon.alt = ""; // 图标只用于装饰
+    let title = document.createElement("span"); // 创建书签标题
+    title.className = "search-result-title"; // 设置标题的类名
+    title.textContent = item.title || item.url; // 标题作为纯文本填入，没有标题时显示链接
+    let url = document.createElement("span"); // 创建书签链接
+    url.className = "search-result-url"; // 设置链接的类名
+    url.textContent = item.url; // 链接作为纯文本填入
+    row.append(icon, title, url); // 组合搜索结果
+    setShortcutIcon(row, getDomain(item.url), item.url); // 设置图标，和快捷方式共用图标缓存
+    fragment.appendChild(row); // 放入文档片段
+  });
+  searchResults.replaceChildren(fragment); // 替换原来的搜索结果
+  searchResults.hidden = !items.length; // 没有结果时隐藏列表
+  searchInput.setAttribute("aria-expanded", String(items.length > 0)); // 标记列表是否展开
+  searchInput.removeAttribute("aria-activedescendant"); // 清除选中的结果
+}
+
+// 选中一个搜索结果，index为-1时取消选择
+function selectSearchResult(index) {
+  let rows = searchResults.children; // 所有搜索结果
+  if (shownResults.selected >= 0) rows[shownResults.selected].removeAttribute("aria-selected"); // 取消原来的选择
+  shownResults.selected = index; // 记录选中的序号
+  if (index < 0) { // 如果取消选择
+    searchInput.removeAttribute("aria-activedescendant"); // 清除选中的结果
+    return;
+  }
+  rows[index].setAttribute("aria-selected", "true"); // 标记选中的结果
+  rows[index].scrollIntoView({block: "nearest"}); // 滚动到选中的结果
+  searchInput.setAttribute("aria-activedescendant", rows[index].id); // 告诉辅助技术当前选中的结果
+}
+
+// 根据id获取快捷方式的链接，收藏夹索引还没有建立时，从当前显示的快照中查找，搜索结果中的书签从搜索索引中查找
+function getShortcutUrl(id) {
+  let node = bookmarkNodes.get(id); // 从收藏夹索引中获取节点
+  if (node) return node.url; // 如果找到了，就返回节点的链接
+  let entry = searchEntries.get(id); // 从搜索索引中获取书签
+  if (entry) return entry.url; // 如果找到了，就返回书签的链接
+  let item = shownShortcuts.items.find(shortcut => shortcut[0] === id); // 从当前显示的快捷方式中查找
+  return item && item[2]; // 返回快捷方式的链接
+}
+
+// 打开快捷方式，background为true时在后台标签页中打开
+function openShortcut(id, background) {
+  let url = getShortcutUrl(id); // 获取快捷方式的链接
+  if (!url) return; // 如果快捷方式已经不存在，就忽略
+  recordVisit(id); // 记录点击，不在这里重新排列，以免快捷方式在鼠标下移动
+  if (background) { // 如果要在后台打开
+    chrome.tabs.create({url: url, active: false}); // 在后台标签页中打开快捷方式的链接
+  } else { // 否则
+    window.open(url, "_blank"); // 在新标签页中打开快捷方式的链接
   }
 }
 
@@ -101,29 +1347,238 @@ function getDomain(url) {
   return a.origin; // 返回a元素的origin属性，即域名部分
 }
 
-// 设置搜索引擎切换按钮的点击事件
-engineButton.onclick = function() {
-  let engine = prompt("请输入要切换的搜索引擎的官网链接，例如：https://www.google.com"); // 弹出一个输入框，提示用户输入搜索引擎的链接
-  if (engine) { // 如果用户输入了内容
-    currentEngine = engine; // 设置当前搜索引擎为用户输入的内容
-    chrome.runtime.sendMessage({action: "setEngine", engine: currentEngine}); // 向后台脚本发送设置搜索引擎的消息
-    engineIcon.src = engine + "/favicon.ico"; // 设置搜索引擎图标
-    searchBox.action = engine + "/search"; // 设置搜索框的链接
+// 提示浏览器预先解析域名并建立连接，anonymous表示连接用于不携带Cookie的跨域请求，每个域名只提示一次
+function warmOrigin(origin, anonymous) {
+  let key = anonymous ? origin + " anonymous" : origin; // 两种请求使用不同的连接
+  if (!/^https?:/.test(origin) || warmedOrigins.has(key)) return; // 只处理网页链接，已经提示过的不再提示
+  warmedOrigins.add(key); // 记录该域名
+  for (let rel of ["dns-prefetch", "preconnect"]) { // 不支持preconnect的浏览器至少会预先解析域名
+    let link = document.createElement("link"); // 创建资源提示
+    link.rel = rel; // 设置提示的类型
+    link.href = origin; // 设置域名
+    if (anonymous) link.crossOrigin = "anonymous"; // 跨域请求使用单独的连接
+    document.head.appendChild(link); // 放入页面头部
   }
+}
+
+// 预先连接当前搜索引擎和搜索建议接口
+function warmSearch() {
+  warmOrigin(getDomain(getSearchUrl(""))); // 搜索时的页面跳转
+  let suggestUrl = getSuggestUrl(""); // 搜索建议接口
+  if (suggestUrl) warmOrigin(getDomain(suggestUrl), true); // 搜索建议请求不携带Cookie
+}
+
+// 预先连接一个快捷方式的域名，超过数量后不再连接
+// 快捷方式通过window.open和chrome.tabs.create打开，不经过本页面的导航，推测规则的预取用不上，扩展页面的内容安全策略也不允许内联的推测规则
+function warmShortcut(url) {
+  if (!url) return; // 没有链接
+  let origin = getDomain(url); // 快捷方式的域名
+  if (!/^https?:/.test(origin) || warmedShortcuts.has(origin) || warmedShortcuts.size >= warmupBudget) return; // 只处理网页链接，已经连接过或超出数量
+  warmedShortcuts.add(origin); // 记录该域名
+  warmOrigin(origin); // 预先连接
+}
+
+// 设置搜索引擎切换按钮的点击事件，打开或关闭搜索引擎菜单
+engineButton.onclick = function() {
+  toggleEngineMenu(engineMenu.hidden); // 切换菜单的显示状态
 };
 
+// 搜索引擎菜单的点击事件，由菜单统一处理
+engineMenu.addEventListener("click", event => {
+  let item = event.target.closest(".engine-item"); // 获取被点击的菜单项
+  if (!item) return; // 没有点到菜单项
+  if (event.target.closest(".engine-remove")) { // 如果点击的是删除按钮
+    removeUserEngine(item.dataset.id); // 删除该搜索引擎
+    engineMenu.querySelector('[aria-checked="true"]').focus(); // 保持焦点在菜单中
+    return;
+  }
+  toggleEngineMenu(false); // 关闭菜单
+  if (item.classList.contains("engine-add")) promptUserEngine(); // 添加搜索引擎
+  else selectEngine(item.dataset.id); // 切换到该搜索引擎
+  searchInput.focus(); // 回到搜索框
+});
+
+// 搜索引擎菜单的键盘操作，方向键切换菜单项，回车和空格选择，Esc关闭
+engineMenu.addEventListener("keydown", event => {
+  let items = [...engineMenu.children]; // 所有菜单项
+  let index = items.indexOf(document.activeElement); // 当前聚焦的菜单项
+  if (event.key === "ArrowDown" || event.key === "ArrowUp") { // 如果按了方向键
+    event.preventDefault(); // 阻止页面滚动
+    items[(index + (event.key === "ArrowDown" ? 1 : items.length - 1)) % items.length].focus(); // 循环聚焦下一个或上一个菜单项
+  } else if (event.key === "Enter" || event.key === " ") { // 如果按了回车或空格
+    event.preventDefault(); // 阻止提交搜索
+    if (index >= 0) items[index].click(); // 选择聚焦的菜单项
+  } else if (event.key === "Escape" || event.key === "Tab") { // 如果按了Esc或离开菜单
+    if (event.key === "Escape") engineButton.focus(); // Esc时回到切换按钮
+    toggleEngineMenu(false); // 关闭菜单
+  }
+});
+
+// 点击菜单以外的地方时关闭搜索引擎菜单
+document.addEventListener("mousedown", event => {
+  if (!engineMenu.hidden && !engineMenu.contains(event.target) && !engineButton.contains(event.target)) toggleEngineMenu(false); // 关闭菜单
+});
+
+// 提交搜索时按当前搜索引擎的搜索链接跳转
+searchBox.addEventListener("submit", event => {
+  event.preventDefault(); // 阻止表单按action提交
+  location.href = getSearchUrl(searchInput.value); // 跳转到搜索结果
+});
+
+// 其他新标签页修改了搜索引擎的设置时同步更新
+chrome.storage.onChanged.addListener((changes, area) => {
+  if (area !== "local") return; // 只处理本地存储
+  if (changes.suggestEndpoint) suggestEndpoint = changes.suggestEndpoint.newValue || ""; // 更新搜索建议接口
+  if (changes.engines) userEngines = changes.engines.newValue || []; // 更新用户添加的搜索引擎
+  if (changes.engine || changes.engines) setEngine(changes.engine ? changes.engine.newValue : currentEngine.id); // 更新当前搜索引擎
+  if (changes.wallpaperPick && (changes.wallpaperPick.newValue || "") !== wallpaperPick) { // 其他新标签页选择了历史图片，或者有了新的图片
+    setWallpaperPick(changes.wallpaperPick.newValue || ""); // 显示选择的图片
+  } else if (changes.wallpaper) { // 后台脚本下载了新的每日图片
+    wallpaperState = "idle"; // 下次显示时重新读取
+    showBackground(); // 正在显示必应每日图片时读取新的图片
+  }
+});
+
+// 文件夹按钮的点击事件，由文件夹列表统一处理，键盘的回车和空格也会触发点击事件
+folderList.addEventListener("click", event => {
+  let folderButton = event.target.closest(".folder-button"); // 获取被点击的文件夹按钮
+  if (!folderButton) return; // 如果没有点击文件夹按钮，就忽略
+  let id = folderButton.dataset.id; // 获取文件夹的id
+  if (event.target.closest(".folder-toggle")) { // 如果点击的是展开按钮
+    toggleFolder(id, !expandedFolders.has(id)); // 展开或收起该文件夹
+  } else { // 否则
+    selectFolder(id); // 切换到该文件夹
+  }
+});
+
+// 在文件夹按钮上按右方向键展开，按左方向键收起
+folderList.addEventListener("keydown", event => {
+  let folderButton = event.target.closest(".folder-button"); // 获取获得焦点的文件夹按钮
+  if (!folderButton || (event.key !== "ArrowRight" && event.key !== "ArrowLeft")) return; // 只处理左右方向键
+  event.preventDefault(); // 阻止页面滚动
+  toggleFolder(folderButton.dataset.id, event.key === "ArrowRight"); // 展开或收起该文件夹
+});
+
+// 快捷方式按钮的点击事件，由快捷方式列表统一处理，按住Ctrl或Command点击时在后台打开
+shortcutList.addEventListener("click", event => {
+  let shortcutButton = event.target.closest(".shortcut-button"); // 获取被点击的快捷方式按钮
+  if (shortcutButton) openShortcut(shortcutButton.dataset.id, event.ctrlKey || event.metaKey); // 打开该快捷方式
+});
+
+// 用鼠标中键点击快捷方式时在后台打开
+shortcutList.addEventListener("auxclick", event => {
+  let shortcutButton = event.target.closest(".shortcut-button"); // 获取被点击的快捷方式按钮
+  if (shortcutButton && event.button === 1) openShortcut(shortcutButton.dataset.id, true); // 在后台打开该快捷方式
+});
+
+// 鼠标在快捷方式上停留一段时间后预先连接该快捷方式的域名，键盘聚焦时也连接
+shortcutList.addEventListener("pointerover", event => {
+  let shortcutButton = event.target.closest(".shortcut-button"); // 获取鼠标所在的快捷方式按钮
+  if (!shortcutButton || shortcutButton.contains(event.relatedTarget)) return; // 在按钮内部移动时不重新计时
+  clearTimeout(warmupTimer); // 取消之前的连接
+  warmupTimer = setTimeout(() => warmShortcut(getShortcutUrl(shortcutButton.dataset.id)), warmupDelay); // 停留后再连接
+});
+shortcutList.addEventListener("pointerout", event => {
+  let shortcutButton = event.target.closest(".shortcut-button"); // 获取鼠标离开的快捷方式按钮
+  if (shortcutButton && !shortcutButton.contains(event.relatedTarget)) clearTimeout(warmupTimer); // 离开按钮时取消连接
+});
+shortcutList.addEventListener("focusin", event => {
+  let shortcutButton = event.target.closest(".shortcut-button"); // 获取聚焦的快捷方式按钮
+  if (shortcutButton) warmShortcut(getShortcutUrl(shortcutButton.dataset.id)); // 预先连接该快捷方式的域名
+});
+
+// 在快捷方式上按下鼠标中键时，阻止浏览器进入自动滚动模式
+shortcutList.addEventListener("mousedown", event => {
+  if (event.button === 1 && event.target.closest(".shortcut-button")) event.preventDefault(); // 阻止自动滚动
+});
+
+// 快捷方式图标无法加载时，就隐藏图标，图片的加载错误事件不会冒泡，所以在捕获阶段监听
+shortcutList.addEventListener("error", event => {
+  if (event.target.tagName === "IMG") event.target.style.display = "none"; // 隐藏加载失败的图标
+}, true);
+
+// 滚动或缩放时，重新渲染虚拟列表中可见的行
+shortcutList.addEventListener("scroll", scheduleShortcutWindow, {passive: true});
+window.addEventListener("resize", scheduleShortcutWindow);
+
+// 窗口变大时换为更大的每日图片版本
+window.addEventListener("resize", () => {
+  if (currentBackground === 1 && wallpaperState === "ready") showWallpaperVariant(); // 正在显示每日图片时重新选择版本
+});
+
+// 在搜索框中输入时显示匹配的书签
+searchInput.addEventListener("input", showSearchResults);
+
+// 搜索框获得焦点时预先连接搜索引擎，提前建立搜索索引，并显示已经输入的内容的搜索结果
+searchInput.addEventListener("focus", () => {
+  warmSearch(); // 预先连接搜索引擎
+  loadSearchIndex(); // 建立搜索索引
+  showSearchResults(); // 显示搜索结果
+});
+
+// 搜索框失去焦点时隐藏搜索结果
+searchInput.addEventListener("blur", () => renderSearchResults([]));
+
+// 在搜索框中用上下方向键选择搜索结果，回车打开选中的书签，Esc关闭搜索结果，没有选中书签时回车仍然用搜索引擎搜索
+searchInput.addEventListener("keydown", event => {
+  let count = shownResults.items.length; // 搜索结果的数量
+  if (!count) return; // 如果没有搜索结果，就不处理
+  if (event.key === "ArrowDown" || event.key === "ArrowUp") { // 如果按了上下方向键
+    event.preventDefault(); // 阻止光标移动到开头或结尾
+    let step = event.key === "ArrowDown" ? 1 : -1; // 移动的方向
+    selectSearchResult((shownResults.selected + step + count + 2) % (count + 1) - 1); // 循环选择，经过搜索框时取消选择
+  } else if (event.key === "Enter" && shownResults.selected >= 0) { // 如果按了回车且选中了书签或搜索建议
+    event.preventDefault(); // 阻止提交搜索
+    let item = shownResults.items[shownResults.selected]; // 选中的结果
+    if (item.suggestion !== undefined) submitSuggestion(item.suggestion); // 搜索选中的建议
+    else openShortcut(item.id, event.ctrlKey || event.metaKey); // 打开选中的书签
+  } else if (event.key === "Escape") { // 如果按了Esc
+    renderSearchResults([]); // 关闭搜索结果
+  }
+});
+
+// 在搜索结果上按下鼠标时，阻止搜索框失去焦点，否则搜索结果会在点击前被隐藏，同时阻止中键的自动滚动
+searchResults.addEventListener("mousedown", event => event.preventDefault());
+
+// 搜索结果的点击事件，由搜索结果列表统一处理，按住Ctrl或Command点击或者用中键点击时在后台打开
+searchResults.addEventListener("click", event => {
+  let row = event.target.closest(".search-result"); // 获取被点击的搜索结果
+  if (!row) return; // 没有点到搜索结果
+  if (row.dataset.suggestion !== undefined) submitSuggestion(row.dataset.suggestion); // 搜索该建议
+  else openShortcut(row.dataset.id, event.ctrlKey || event.metaKey); // 打开该书签
+});
+searchResults.addEventListener("auxclick", event => {
+  let row = event.target.closest(".search-result"); // 获取被点击的搜索结果
+  if (row && row.dataset.id && event.button === 1) openShortcut(row.dataset.id, true); // 在后台打开该书签，搜索建议不支持
+});
+
+// 搜索结果的图标无法加载时，就隐藏图标
+searchResults.addEventListener("error", event => {
+  if (event.target.tagName === "IMG") event.target.style.display = "none"; // 隐藏加载失败的图标
+}, true);
+
 // 设置背景切换按钮的点击事件
 backgroundButton.onclick = function() {
   currentBackground = 1 - currentBackground; // 切换当前背景
   chrome.storage.local.set({background: currentBackground}); // 将当前背景保存到本地存储
-  getBackground(); // 获取并设置背景
+  showBackground(); // 设置背景
+  saveSnapshot(); // 保存新的背景
 };
 
-// 在新标签页加载时，执行以下函数
-window.onload = function() {
-    getEngine(); // 获取并设置搜索引擎
-    getBackground(); // 获取并设置背景
-    getBookmarks(); // 获取并生成收藏夹
-    chrome.runtime.sendMessage({action: "getImage"}); // 向后台脚本发送获取图片的消息
-  };
-  
+// 设置翻看历史图片的按钮的点击事件
+wallpaperPrev.onclick = () => stepWallpaper(-1); // 前一天的图片
+wallpaperNext.onclick = () => stepWallpaper(1); // 后一天的图片
+
+// 设置排序切换按钮的点击事件，在收藏夹顺序和使用频率之间切换
+sortButton.onclick = function() {
+  setSortByVisits(!sortByVisits); // 切换排序方式
+  chrome.storage.local.set({sortByVisits: sortByVisits}); // 将排序方式保存到本地存储
+  if (bookmarksReady) showFolder(currentFolder); // 重新排列当前文件夹
+};
+
+// 页面关闭前写入图标的使用时间和快捷方式的点击统计
+window.addEventListener("pagehide", flushFavicons);
+window.addEventListener("pagehide", flushVisits);
+
+// 在脚本执行时就启动，网页脚本放在body的末尾，此时文档已经解析完成
+startup();
@@ -0,0 +1,283 @@
+// 收藏夹搜索索引，按书签的标题和链接建立三字索引和词首索引，输入时只查索引，不遍历整个收藏夹，
+// 只依赖标准JavaScript，新标签页和搜索线程都可以使用
+const searchResultLimit = 8; // 默认返回的搜索结果数量
+const searchTopLimit = 32; // 词首索引的每个键预先排好的书签数量，一两个字符的查询直接从中取结果，删除书签后剩下的不够时才遍历
+const searchWordPattern = /\p{Script=Han}|[^\p{Script=Han}\p{Z}\p{P}\p{S}]+/gu; // 词的匹配规则，每个汉字单独算一个词，其他文字按标点和空格分词
+const pinyinVariantLimit = 4; // 多音字组合出的读法数量上限，超过后其余的多音字只用最常用的读音
+let pinyinPromise = null; // 读取拼音字典的Promise，只读取一次
+
+// 读取拼音字典，返回一个Promise，结果为汉字 -> 拼音数组的Map，读取失败时为null，不使用拼音搜索
+function loadPinyin() {
+  if (!pinyinPromise) { // 如果还没有读取过
+    pinyinPromise = fetch("pinyin.json").then(response => response.json()).then(dictionary => { // 读取扩展中的拼音字典，最常用的读音按拼音分组，多音字的其他读音单独列出
+      let pinyin = new Map(); // 汉字 -> 拼音数组，第一个是最常用的读音
+      for (let [syllable, hans] of Object.entries(dictionary.readings)) { // 遍历每个拼音
+        for (let han of hans) pinyin.set(han, [syllable]); // 记录该汉字最常用的读音
+      }
+      for (let [han, syllables] of Object.entries(dictionary.polyphones)) { // 遍历常用多音字
+        let list = pinyin.get(han) || []; // 该汉字已有的读音
+        for (let syllable of syllables.split(" ")) if (!list.includes(syllable)) list.push(syllable); // 在最常用的读音后面加入其他读音
+        pinyin.set(han, list); // 记录该汉字的读音
+      }
+      return pinyin; // 返回拼音表
+    }).catch(() => { // 读取失败
+      pinyinPromise = null; // 下次使用时重新读取
+      return null; // 不使用拼音搜索
+    });
+  }
+  return pinyinPromise; // 返回读取拼音字典的Promise
+}
+
+// 创建一个空的搜索索引，pinyin为汉字 -> 拼音的Map，有拼音表时标题中的汉字也可以用拼音和首字母搜索
+function createSearchIndex(pinyin) {
+  return {
+    pinyin: pinyin || null, // 汉字 -> 拼音数组
+    entries: new Map(), // 书签id -> 书签在docs中的序号
+    docs: [], // 索引中的书签 {id, title, url, text, titleLength, keyStarts, urlStart}，已经删除或修改过的书签对应null
+    grams: new Map(), // 三字索引，连续三个字符 -> 书签序号数组
+    prefixes: new Map(), // 词首索引，词开头的一到两个字符 -> 书签序号数组
+    tops: new Map(), // 词首索引的每个键匹配程度最高的书签，词开头的一到两个字符 -> [分数, 书签序号]数组，按分数从高到低排列
+    stale: 0, // docs中已经失效的书签数量，过多时重建索引
+    version: 0, // 索引的版本，书签变化时递增
+    last: null // 上一次查询的结果 {query, version, docs}，继续输入时只在上一次的结果中查找
+  };
+}
+
+// 规范化文本，全角字符转为半角，字母转为小写
+function normalizeSearchText(text) {
+  return text.normalize("NFKC").toLowerCase(); // 规范化并转为小写
+}
+
+// 将一个书签加入搜索索引，已经在索引中时更新它的标题和链接
+function addSearchEntry(index, node) {
+  if (!node.url) return; // 只索引书签，不索引文件夹
+  removeSearchEntry(index, node.id); // 原来的索引项失效，书签使用新的序号重新加入
+  let doc = index.docs.length; // 书签的序号
+  let title = normalizeSearchText(node.title); // 规范化后的标题
+  let url = normalizeSearchText(node.url.replace(/^[a-z][\w+.-]*:\/\/(www\.)?/i, "")); // 规范化后的链接，去掉协议和www
+  let keys = index.pinyin && getPinyinKeys(title, index.pinyin); // 标题的拼音和首字母
+  let text = (keys ? [title, keys.text, url] : [title, url]).join(" "); // 被搜索的文本，用join生成连续存储的字符串，查询时逐字符读取更快
+  let keysStart = title.length + 1; // 拼音在文本中的位置
+  index.docs.push({ // 记录书签
+    id: node.id, // 书签id
+    title: node.title, // 原始标题
+    url: node.url, // 链接
+    text: text, // 被搜索的文本：标题、全拼和首字母、链接
+    titleLength: title.length, // 标题的长度
+    keyStarts: keys ? keys.keyStarts.map(start => keysStart + start) : [], // 每个全拼和首字母在文本中的位置
+    urlStart: text.length - url.length // 链接在文本中的位置
+  });
+  index.entries.set(node.id, doc); // 记录书签的序号
+  let grams = new Set(); // 该书签的三字组合，去重后再加入索引
+  for (let i = 0; i + 3 <= text.length; i++) grams.add(text.slice(i, i + 3)); // 取出所有连续三个字符
+  for (let gram of grams) addSearchPosting(index.grams, gram, doc); // 加入三字索引
+  let prefixes = new Set(); // 该书签的词首，去重后再加入索引
+  let starts = [...text.matchAll(searchWordPattern)].map(match => match.index); // 每个词开头的位置
+  if (keys) starts.push(...keys.starts.map(start => keysStart + start)); // 拼音中每个音节的开头也算词首，输入"du"可以找到"百度"
+  for (let start of starts) { // 遍历每个词首
+    prefixes.add(text[start]); // 词的第一个字符
+    if (start + 1 < text.length) prefixes.add(text.slice(start, start + 2)); // 词的前两个字符
+  }
+  for (let prefix of prefixes) { // 遍历每个词首
+    addSearchPosting(index.prefixes, prefix, doc); // 加入词首索引
+    addSearchTop(index.tops, prefix, scoreSearchEntry(index.docs[doc], [prefix]), doc); // 按只查询该键时的匹配程度加入排名
+  }
+  index.version++; // 索引变化了
+}
+
+// 将书签序号加入一个索引键对应的数组，同一个书签的序号在数组中只出现一次，且按从小到大排列
+function addSearchPosting(postings, key, doc) {
+  let docs = postings.get(key); // 该键对应的书签序号数组
+  if (docs) docs.push(doc); // 加入数组
+  else postings.set(key, [doc]); // 创建数组
+}
+
+// 将书签加入一个词首对应的排名，只保留前searchTopLimit个，分数相同时先加入的靠前，和查询时遍历的顺序一致
+function addSearchTop(tops, key, score, doc) {
+  let top = tops.get(key); // 该键的排名
+  if (!top) tops.set(key, top = []); // 创建排名
+  if (top.length === searchTopLimit && score <= top[searchTopLimit - 1][0]) return; // 不如已有的书签时跳过
+  let position = top.length; // 插入的位置
+  while (position > 0 && top[position - 1][0] < score) position--; // 找到按分数排列的位置
+  top.splice(position, 0, [score, doc]); // 插入排名
+  if (top.length > searchTopLimit) top.pop(); // 只保留前searchTopLimit个
+}
+
+// 判断书签序号是否在一个索引键对应的数组中，数组按从小到大排列，用二分查找
+function hasSearchPosting(docs, doc) {
+  let low = 0, high = docs.length - 1; // 查找的范围
+  while (low <= high) { // 当范围不为空时
+    let middle = (low + high) >> 1; // 中间的位置
+    if (docs[middle] === doc) return true; // 找到了
+    if (docs[middle] < doc) low = middle + 1; // 在右半部分
+    else high = middle - 1; // 在左半部分
+  }
+  return false; // 不在数组中
+}
+
+// 从搜索索引中删除一个书签，索引键对应的数组不立即修改，查询时会跳过已经删除的书签，失效的项过多时重建索引
+function removeSearchEntry(index, id) {
+  let doc = index.entries.get(id); // 书签的序号
+  if (doc === undefined) return; // 如果不在索引中，就忽略
+  index.entries.delete(id); // 删除书签
+  index.docs[doc] = null; // 标记该序号已经失效
+  index.stale++; // 记录失效的项
+  index.version++; // 索引变化了
+  if (index.stale > 1000 && index.stale > index.entries.size) rebuildSearchIndex(index); // 失效的项太多时重建索引
+}
+
+// 用索引中现有的书签重建索引，清除已经失效的项
+function rebuildSearchIndex(index) {
+  let docs = index.docs.filter(Boolean); // 现有的书签
+  Object.assign(index, createSearchIndex(index.pinyin), {version: index.version}); // 清空索引，保留拼音表和版本
+  for (let doc of docs) addSearchEntry(index, doc); // 重新加入每个书签
+}
+
+// 将书签编码为一个ArrayBuffer，字段之间用\0分隔，可以转移给搜索线程而不用逐个复制对象
+function encodeSearchEntries(nodes) {
+  let fields = []; // 依次为每个书签的id、标题和链接
+  for (let node of nodes) fields.push(node.id, node.title.replace(/\0/g, ""), node.url); // 去掉标题中的分隔符
+  return new TextEncoder().encode(fields.join("\0")).buffer; // 编码为UTF-8
+}
+
+// 解码encodeSearchEntries编码的书签，返回{id, title, url}数组
+function decodeSearchEntries(buffer) {
+  let text = new TextDecoder().decode(buffer); // 解码为字符串
+  if (!text) return []; // 没有书签
+  let fields = text.split("\0"); // 拆分字段
+  let nodes = []; // 解码出的书签
+  for (let i = 0; i < fields.length; i += 3) nodes.push({id: fields[i], title: fields[i + 1], url: fields[i + 2]}); // 每三个字段为一个书签
+  return nodes;
+}
+
+// 在搜索索引中查找书签，返回按匹配程度排序的前limit个书签，查询按空格分为多个词，书签需要包含所有的词
+function searchBookmarks(index, query, limit = searchResultLimit) {
+  let normalized = normalizeSearchText(query).trim(); // 规范化后的查询
+  let terms = normalized.split(/\s+/).filter(Boolean); // 查询中的词
+  if (!terms.length) return []; // 查询为空时没有结果
+  if (terms.length === 1 && terms[0].length < 3) { // 一两个字符的查询几乎匹配所有书签，直接使用预先排好的结果
+    let top = getSearchTop(index, terms[0], limit); // 该词首匹配程度最高的书签
+    if (top) return top; // 删除书签后剩下的不够时才遍历
+  }
+  let last = index.last; // 上一次查询的结果
+  let candidates; // 候选书签的序号
+  for (let term of terms) { // 每个词都找出候选书签，取最少的一组
+    let docs = getSearchPostings(index, term); // 包含该词的候选书签
+    if (!candidates || docs.length < candidates.length) candidates = docs; // 记录最少的一组
+  }
+  if (last && last.version === index.version && last.substring && normalized.startsWith(last.query) && last.docs.length < candidates.length) { // 如果是在上一次查询后面继续输入，上一次的候选书签来自三字索引，并且比索引中的更少
+    candidates = last.docs; // 结果一定在上一次的结果中，一两个字符的词只匹配词首，变长后可能匹配词的中间，不能沿用
+  }
+  let starts = terms.filter(term => term.length < 3).map(term => index.prefixes.get(term) || []); // 一两个字符的词所在词首的书签序号，候选书签来自三字索引时也只匹配词首
+  let matched = []; // 包含所有词的书签的序号
+  let results = []; // 排名靠前的书签 [分数, 书签]，按分数从高到低排列
+  for (let doc of candidates) { // 检查每个候选书签
+    let entry = index.docs[doc]; // 获取书签
+    if (!entry || !starts.every(docs => hasSearchPosting(docs, doc))) continue; // 跳过已经删除或短词不在词首的书签
+    let score = scoreSearchEntry(entry, terms); // 计算匹配程度，同时检查是否包含所有的词
+    if (score < 0) continue; // 跳过不包含所有词的书签
+    matched.push(doc); // 记录匹配的书签
+    if (results.length === limit && score <= results[limit - 1][0]) continue; // 不如已有的结果时跳过
+    let position = results.length; // 插入的位置
+    while (position > 0 && results[position - 1][0] < score) position--; // 找到按分数排列的位置
+    results.splice(position, 0, [score, entry]); // 插入结果
+    if (results.length > limit) results.pop(); // 只保留前limit个
+  }
+  index.last = {query: normalized, version: index.version, docs: matched, substring: terms.every(term => term.length >= 3)}; // 记录本次查询的结果，所有词都不短于三个字符时结果包含所有子串匹配
+  return results.map(([, entry]) => entry); // 返回书签
+}
+
+// 从词首的排名中取出前limit个现有的书签，排名中的书签删除后剩下的不够，并且排名之外还有书签时返回null
+function getSearchTop(index, term, limit) {
+  let top = index.tops.get(term) || []; // 该词首的排名
+  let results = []; // 现有的书签
+  for (let [, doc] of top) { // 按分数从高到低遍历
+    let entry = index.docs[doc]; // 获取书签
+    if (entry) results.push(entry); // 跳过已经删除的书签
+    if (results.length === limit) return results; // 已经够了
+  }
+  return top.length < searchTopLimit ? results : null; // 排名没有满时包含了该词首的所有书签
+}
+
+// 生成标题的全拼和首字母，例如"百度一下"生成"baiduyixia bdyx"，其他字符原样保留，多音字的每种读法都生成一组，
+// 返回 {text: 所有全拼和首字母, keyStarts: 每个全拼和首字母的开头, starts: 全拼中每个音节的开头}，标题中没有汉字时返回null
+function getPinyinKeys(title, pinyin) {
+  let variants = [{full: "", initials: "", starts: []}]; // 标题的各种读法
+  let found = false; // 标题中是否有汉字
+  for (let char of title) { // 遍历标题中的每个字符
+    let syllables = pinyin.get(char); // 该字符的读音
+    if (!syllables) { // 如果不是汉字
+      for (let variant of variants) { // 原样加入每种读法
+        variant.full += char; // 加入全拼
+        variant.initials += char; // 加入首字母
+      }
+      continue;
+    }
+    found = true; // 标题中有汉字
+    if (variants.length * syllables.length > pinyinVariantLimit) syllables = syllables.slice(0, 1); // 读法太多时只用最常用的读音，拼音表中第一个读音是最常用的
+    variants = variants.flatMap(variant => syllables.map(syllable => ({ // 每种读法和该字的每个读音组合
+      full: variant.full + syllable, // 加入全拼
+      initials: variant.initials + syllable[0], // 加入首字母
+      starts: variant.starts.concat(variant.full.length) // 记录音节开头的位置
+    })));
+  }
+  if (!found) return null; // 没有汉字时不需要拼音
+  let keys = {text: "", keyStarts: [], starts: []}; // 生成的全拼和首字母
+  let seen = new Set(); // 已经加入的全拼和首字母，不同读法的首字母可能相同
+  for (let variant of variants) { // 遍历每种读法
+    for (let key of [variant.full, variant.initials]) { // 先加入全拼，再加入首字母
+      if (seen.has(key)) continue; // 跳过重复的
+      seen.add(key); // 记录已经加入
+      let start = keys.text ? keys.text.length + 1 : 0; // 该组在文本中的位置
+      if (key === variant.full) keys.starts.push(...variant.starts.map(offset => start + offset)); // 记录全拼中每个音节的开头
+      keys.keyStarts.push(start); // 记录该组的开头
+      keys.text += (start ? " " : "") + key; // 加入文本
+    }
+  }
+  return keys; // 返回全拼和首字母
+}
+
+// 从索引中找出可能包含一个词的书签序号，长词用三字索引中最短的一组，一两个字符的词用词首索引
+function getSearchPostings(index, term) {
+  if (term.length < 3) return index.prefixes.get(term) || []; // 短词只匹配词首
+  let shortest = null; // 最短的一组书签序号
+  for (let i = 0; i + 3 <= term.length; i++) { // 遍历词中的每个三字组合
+    let docs = index.grams.get(term.slice(i, i + 3)); // 包含该三字组合的书签序号
+    if (!docs) return []; // 有一个三字组合不存在时，没有书签包含该词
+    if (!shortest || docs.length < shortest.length) shortest = docs; // 记录最短的一组
+  }
+  return shortest; // 返回最短的一组
+}
+
+// 计算书签和查询的匹配程度，标题开头匹配最好，其次是拼音或首字母开头、标题中的词首、标题中间和链接，标题越短越靠前，不包含所有的词时为-1
+function scoreSearchEntry(entry, terms) {
+  let score = 0; // 匹配程度
+  for (let term of terms) { // 每个词分别计分
+    let position = entry.text.indexOf(term); // 该词第一次出现的位置
+    if (position < 0) return -1; // 有一个词不包含就不匹配
+    if (position === 0) score += 100; // 标题开头
+    else if (position < entry.titleLength) score += isSearchWordStart(entry.text, position) ? 60 : 30; // 标题中的词首或中间
+    else if (position < entry.urlStart) score += entry.keyStarts.includes(position) ? 90 : 40; // 全拼或首字母的开头或中间
+    else score += isSearchWordStart(entry.text, position) ? 20 : 10; // 链接中的词首或中间
+  }
+  return score - entry.titleLength / 100; // 标题越短越靠前
+}
+
+// 判断文本中的一个位置是否是词的开头，汉字和分隔符之后都是新的词，和searchWordPattern的分词一致
+function isSearchWordStart(text, position) {
+  if (position === 0) return true; // 文本开头
+  let code = text.charCodeAt(position); // 该位置的字符
+  let previous = text.charCodeAt(position - 1); // 前一个字符
+  return isHanCode(code) || isHanCode(previous) || !isWordCode(previous); // 汉字本身是一个词，汉字和分隔符之后是新的词
+}
+
+// 判断一个字符是否是常用汉字
+function isHanCode(code) {
+  return (code >= 0x3400 && code <= 0x9fff) || (code >= 0xf900 && code <= 0xfaff); // 中日韩统一表意文字和兼容表意文字
+}
+
+// 判断一个字符是否属于词，数字、字母和其他文字属于词，空格、标点和符号是分隔符
+function isWordCode(code) {
+  if (code < 0x80) return (code >= 48 && code <= 57) || (code >= 97 && code <= 122); // 规范化后的ASCII只有小写字母和数字属于词
+  return code >= 0xc0 && !(code >= 0x2000 && code <= 0x2bff) && !(code >= 0x3000 && code <= 0x303f) && !(code >= 0xfe30 && code <= 0xfe4f); // 排除通用标点、符号和中文标点
+}
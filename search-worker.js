@@ -0,0 +1,41 @@
+// 收藏夹搜索线程，在这里建立和查询搜索索引，新标签页只需要显示返回的书签，建立索引时不会阻塞输入
+importScripts("search-index.js"); // 引入收藏夹搜索索引脚本文件
+let searchIndex = null; // 收藏夹搜索索引
+let latestQuery = ""; // 最近收到的查询，处理到更早的查询时直接跳过
+let pendingMessages = Promise.resolve(); // 按收到的顺序依次处理消息，读取拼音字典期间收到的消息等建立索引后再处理
+
+// 读取拼音字典，并用新标签页传来的书签建立搜索索引
+function loadIndex(buffer) {
+  return loadPinyin().then(pinyin => { // 读取拼音字典，读取失败时不使用拼音搜索
+    searchIndex = createSearchIndex(pinyin); // 创建空的索引
+    for (let node of decodeSearchEntries(buffer)) addSearchEntry(searchIndex, node); // 加入每个书签
+  });
+}
+
+// 收藏夹变化时增量更新搜索索引，removed为删除的书签id，added为新增或修改的书签
+function updateIndex(removed, added) {
+  for (let id of removed) removeSearchEntry(searchIndex, id); // 删除书签
+  for (let node of decodeSearchEntries(added)) addSearchEntry(searchIndex, node); // 加入书签，已经存在的会先删除
+}
+
+// 查找匹配的书签，只返回书签的id，已经有更新的查询时不再查找
+function search(query) {
+  if (query !== latestQuery) return; // 用户已经继续输入了
+  let ids = searchBookmarks(searchIndex, query).map(entry => entry.id); // 查找匹配的书签
+  postMessage({type: "results", query: query, ids: ids}); // 返回给新标签页
+}
+
+// 处理新标签页发来的消息
+function handleMessage(message) {
+  if (message.type === "load") return loadIndex(message.buffer); // 建立索引
+  if (!searchIndex) return; // 索引建立失败时忽略其他消息
+  if (message.type === "update") updateIndex(message.removed, message.added); // 更新索引
+  else if (message.type === "search") search(message.query); // 查找书签
+}
+
+// 接收新标签页发来的消息，排队依次处理
+onmessage = event => {
+  let message = event.data; // 消息内容
+  if (message.type === "search") latestQuery = message.query; // 记录最新的查询
+  pendingMessages = pendingMessages.then(() => handleMessage(message)).catch(() => {}); // 一条消息出错时不影响后面的消息
+};
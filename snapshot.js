@@ -0,0 +1,20 @@
+// 同步绘制上次的界面，网页解析到这里时就从localStorage读取快照，画出文件夹、快捷方式和背景，不等待异步的chrome.storage，
+// 网页脚本加载后接管这些元素，扩展页面不允许内联脚本，所以放在单独的文件中，并且只做最少的工作
+const snapshotKey = "newtabSnapshot"; // 快照在localStorage中的键
+const snapshotVersion = 3; // 快照的格式版本，快照格式变化时需要递增
+const paintedSnapshot = paintSnapshot(); // 已经画出的快照，没有画出时为null
+
+// 读取快照并画出界面，返回快照
+function paintSnapshot() {
+  let snapshot = null; // 快照
+  try {
+    snapshot = JSON.parse(localStorage.getItem(snapshotKey)); // 同步读取快照
+  } catch (error) { // 快照损坏时
+    return null; // 等待实时数据
+  }
+  if (!snapshot || snapshot.version !== snapshotVersion) return null; // 如果没有快照或者快照版本不符，就等待实时数据
+  document.body.style.cssText = snapshot.background; // 设置背景
+  document.getElementById("folder-list").innerHTML = snapshot.folderHtml; // 画出文件夹按钮
+  document.getElementById("shortcut-list").innerHTML = snapshot.shortcutHtml; // 画出快捷方式按钮，虚拟列表为空，由网页脚本渲染
+  return snapshot; // 返回快照，网页脚本用它接管界面
+}
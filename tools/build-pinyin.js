@@ -0,0 +1,40 @@
+// 生成收藏夹搜索用的拼音字典pinyin.json，用ICU的uconv把基本区的每个汉字转写为拼音，
+// 去掉声调，ü写作v，readings按拼音分组，每组是以该读音为最常用读音的所有汉字，polyphones是常用多音字的其他读音
+//
+// 用法：node tools/build-pinyin.js
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+const {execFileSync} = require("child_process");
+
+const first = 0x4e00; // 中日韩统一表意文字基本区的第一个汉字
+const last = 0x9fff; // 基本区的最后一个汉字
+
+// 常用多音字的其他读音，uconv只给出一个读音，这些字在网站标题中常用其他读音，例如"银行"、"长沙"、"重庆"
+const polyphones = {
+  "行": "hang", "长": "chang", "重": "chong", "乐": "yue", "还": "huan", "了": "liao", "会": "kuai", "调": "tiao",
+  "都": "du", "传": "zhuan", "藏": "zang", "校": "jiao", "朝": "zhao", "单": "shan", "参": "shen", "大": "dai",
+  "地": "di", "得": "dei", "的": "di", "着": "zhao zhuo", "差": "chai", "曾": "zeng", "便": "pian", "度": "duo",
+  "解": "xie", "降": "xiang", "角": "jue", "觉": "jiao", "省": "xing", "区": "ou", "弹": "tan", "露": "lou",
+  "薄": "bo", "给": "ji", "系": "ji", "血": "xie", "率": "shuai", "厦": "xia", "尾": "yi", "说": "shui",
+  "阿": "e", "查": "zha", "盛": "cheng", "秘": "bi", "翟": "zhai", "朴": "piao", "乘": "sheng", "屏": "bing",
+  "模": "mu", "壳": "qiao", "剥": "bao", "没": "mo", "哪": "nei", "那": "nei", "期": "ji", "似": "si",
+  "咖": "ga", "卡": "qia", "核": "hu", "和": "huo hu", "奇": "ji", "种": "chong", "数": "shuo", "仇": "qiu"
+};
+
+let hans = []; // 基本区的所有汉字
+for (let code = first; code <= last; code++) hans.push(String.fromCharCode(code)); // 逐个加入
+let latin = execFileSync("uconv", ["-x", "Han-Latin"], {input: hans.join("\n"), encoding: "utf8"}).split("\n"); // 转写为带声调的拼音，每行一个汉字
+
+let readings = {}; // 拼音 -> 以该读音为最常用读音的汉字
+hans.forEach((han, i) => {
+  let syllable = (latin[i] || "").trim().replace(/[üǖǘǚǜ]/g, "v").normalize("NFD").replace(/\p{M}/gu, "").toLowerCase(); // 去掉声调
+  if (/^[a-z]+$/.test(syllable)) readings[syllable] = (readings[syllable] || "") + han; // 跳过没有拼音的汉字
+});
+
+// 多音字的读音顺序决定组合过多时保留哪个读音，所以uconv给出的最常用读音和其他读音分开保存，读取时先记录最常用的读音
+let sorted = Object.fromEntries(Object.entries(readings).sort(([a], [b]) => a < b ? -1 : 1)); // 按拼音排序，便于比较生成结果
+let dictionary = {readings: sorted, polyphones: polyphones}; // 字典
+fs.writeFileSync(path.join(__dirname, "..", "pinyin.json"), JSON.stringify(dictionary) + "\n"); // 写入字典
+console.log(`${Object.keys(sorted).length}个拼音，${Object.values(sorted).join("").length}个汉字，${Object.keys(polyphones).length}个多音字`);